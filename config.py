@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -8,10 +9,48 @@ load_dotenv()
 PORT = int(os.environ.get("PORT", 8080))
 BASE_URL = os.environ.get("KOYEB_PUBLIC_URL", "").rstrip("/")
 ADMIN_CONTACT = os.environ.get("ADMIN_CONTACT", "@Erivative")
+ENV = os.environ.get("ENV", "dev")  # "prod" lowers log verbosity to WARNING
 
 # ===== Database Config =====
 DATABASE_URL = os.environ.get("DATABASE_URL")
 DATABASE_PATH = os.environ.get("DATABASE_PATH", "translations.db")
+DB_POOL_MIN_SIZE = int(os.environ.get("DB_POOL_MIN_SIZE", 4))
+DB_POOL_MAX_SIZE = int(os.environ.get("DB_POOL_MAX_SIZE", 20))
+# Executions before psycopg turns a query into a server-side prepared statement. Off by default:
+# Neon's pooled endpoint is a transaction-mode PgBouncer that can't keep prepared statements.
+# Set e.g. "1" only with a direct (non-pooled) connection string.
+_prepare_threshold = os.environ.get("DB_PREPARE_THRESHOLD", "none")
+DB_PREPARE_THRESHOLD = int(_prepare_threshold) if _prepare_threshold.isdigit() else None
+# Seconds a user's access tier / limits may be served from memory (grant/revoke invalidate immediately)
+ACCESS_CACHE_TTL = int(os.environ.get("ACCESS_CACHE_TTL", 60))
+REDIS_URL = os.environ.get("REDIS_URL")  # Optional: rate limiting moves off the SQL database when set
+# TinyLFU admission: a translation is written to the cache table only once its text has missed
+# this many times recently (1 disables the filter and caches everything)
+CACHE_ADMISSION_THRESHOLD = int(os.environ.get("CACHE_ADMISSION_THRESHOLD", 2))
+# Seconds between background refreshes of the cache stats served by /health and /metrics
+CACHE_STATS_REFRESH_INTERVAL = float(os.environ.get("CACHE_STATS_REFRESH_INTERVAL", "10"))
+
+# ===== Update Processing =====
+# Webhook updates are queued (bounded, 503 when full) and handled concurrently
+UPDATE_QUEUE_SIZE = int(os.environ.get("UPDATE_QUEUE_SIZE", 1024))
+MAX_CONCURRENT_UPDATES = int(os.environ.get("MAX_CONCURRENT_UPDATES", 32))
+# Translation workers; each chat maps to one shard, so a chat's messages are answered in order
+TRANSLATION_QUEUE_SHARDS = int(os.environ.get("TRANSLATION_QUEUE_SHARDS", 16))
+# Pending translations held across all shards; beyond this new requests get a "busy" reply
+TRANSLATION_QUEUE_MAX_SIZE = int(os.environ.get("TRANSLATION_QUEUE_MAX_SIZE", 512))
+# Seconds a queued translation may wait before it is dropped instead of sent upstream
+TRANSLATION_STALENESS_BUDGET = float(os.environ.get("TRANSLATION_STALENESS_BUDGET", "30.0"))
+# Waiting requests from one chat that a worker translates concurrently (delivered in order)
+TRANSLATION_BATCH_SIZE = int(os.environ.get("TRANSLATION_BATCH_SIZE", 8))
+
+# ===== Temp Files =====
+# Short-lived media (voice, photos, TTS) goes to RAM-backed /dev/shm when available
+TMP_DIR = os.environ.get("TMP_DIR") or (
+    "/dev/shm" if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK) else tempfile.gettempdir()
+)
+# Synthesized TTS clips, keyed by voice and text; least recently used files are evicted past the limit
+TTS_CACHE_DIR = os.environ.get("TTS_CACHE_DIR") or os.path.join(TMP_DIR, "darja_tts")
+TTS_CACHE_MAX_FILES = int(os.environ.get("TTS_CACHE_MAX_FILES", 2000))
 
 # ===== API Keys =====
 TELEGRAM_TOKEN = os.environ.get("TELEGRAM_BOT_TOKEN")
@@ -30,6 +69,14 @@ if not GEMINI_API_KEYS and not GROQ_API_KEY:
 # ===== Model Config =====
 DEFAULT_MODEL = "gemini-2.0-flash"
 GROQ_MODEL = os.environ.get("GROQ_MODEL", "llama-3.3-70b-versatile")
+# Seconds to wait on one Gemini key before racing the same request on the next key
+GEMINI_HEDGE_DELAY = float(os.environ.get("GEMINI_HEDGE_DELAY", "3.0"))
+# Same for image/voice requests, which upload a file first and take longer even on a healthy key
+GEMINI_MEDIA_HEDGE_DELAY = float(os.environ.get("GEMINI_MEDIA_HEDGE_DELAY", "8.0"))
+# Upper bound in seconds for one model attempt across all keys before falling back to the next model
+GEMINI_ATTEMPT_TIMEOUT = float(os.environ.get("GEMINI_ATTEMPT_TIMEOUT", "30.0"))
+# Text translations allowed upstream (Gemini/Groq) at once, across all queue workers
+PROVIDER_CONCURRENCY = int(os.environ.get("PROVIDER_CONCURRENCY", 8))
 
 # ===== Payment Config =====
 STRIPE_BASIC_LINK = os.environ.get("STRIPE_BASIC_LINK")
@@ -1,24 +1,172 @@
 import os
 import logging
 import asyncio
+import time
+import hashlib
 import aiosqlite
+from cachetools import TTLCache
 from datetime import datetime
+from functools import lru_cache
 
 try:
     import psycopg
+    from psycopg_pool import AsyncConnectionPool
 except ImportError:
     psycopg = None
+    AsyncConnectionPool = None
 
-from config import DATABASE_PATH, DATABASE_URL
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+from utils import normalize_text
+from config import DATABASE_PATH, DATABASE_URL, DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_PREPARE_THRESHOLD, REDIS_URL, ACCESS_CACHE_TTL, CACHE_ADMISSION_THRESHOLD
 
 logger = logging.getLogger(__name__)
 
+# Sliding-window counter: count the request in the current bucket, return it with the previous bucket's count.
+# A denied request is uncounted again (ARGV[2] is the previous bucket's weight, ARGV[3] the limit), so retrying
+# while limited doesn't extend the lockout.
+RATE_LIMIT_LUA = """
+local cur = redis.call('INCR', KEYS[1])
+if cur == 1 then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+local prev = tonumber(redis.call('GET', KEYS[2]) or '0')
+if cur + prev * tonumber(ARGV[2]) > tonumber(ARGV[3]) then
+    redis.call('DECR', KEYS[1])
+end
+return {cur, prev}
+"""
+
+def sliding_window_limit(cur_count, prev_count, now_ts, window_seconds, max_requests):
+    """Weigh the previous bucket by how much of it still overlaps the window; returns (allowed, remaining, reset_minutes).
+    
+    cur_count includes this request; a denied request is uncounted again by the caller, so
+    reset_minutes (how long until one more request fits) is worked out from what stays stored.
+    """
+    elapsed = now_ts % window_seconds
+    effective = cur_count + prev_count * (1 - elapsed / window_seconds)
+    allowed = effective <= max_requests
+    stored = cur_count if allowed else cur_count - 1
+    if stored + 1 <= max_requests:
+        # Still inside this bucket, once enough of the previous one has slid out
+        free_at = window_seconds * (1 - (max_requests - stored - 1) / prev_count) if prev_count else 0
+        wait = max(0, free_at - elapsed)
+    else:
+        # Only after rollover, when this bucket becomes the (decaying) previous one
+        free_at = window_seconds * (1 - (max_requests - 1) / stored)
+        wait = window_seconds - elapsed + max(0, free_at)
+    reset_minutes = max(1, -(-int(wait) // 60))
+    if not allowed:
+        return False, 0, reset_minutes
+    return True, int(max_requests - effective), reset_minutes
+
+# ===== Write-Behind =====
+# Fire-and-forget writes are queued and flushed in batches, off the reply path
+WRITE_BATCH_WINDOW = 0.05
+WRITE_BATCH_SIZE = 100
+WRITE_STATEMENTS = {
+    'history': 'INSERT INTO history (user_id, text) VALUES (?, ?)',
+    'cache': (
+        'INSERT INTO cache (text_hash, text, dialect, translation) VALUES (?, ?, ?, ?) '
+        'ON CONFLICT (text_hash) DO UPDATE SET translation = EXCLUDED.translation, last_used = CURRENT_TIMESTAMP'
+    ),
+    'cache_hit': 'UPDATE cache SET hit_count = hit_count + ?, last_used = CURRENT_TIMESTAMP WHERE text_hash = ?',
+}
+# Append-only kinds stream into PostgreSQL with COPY instead of one INSERT per row
+COPY_STATEMENTS = {
+    'history': 'COPY history (user_id, text) FROM STDIN',
+}
+
+@lru_cache(maxsize=512)
+def pg_placeholders(query):
+    """sqlite '?' placeholders -> psycopg '%s', rewritten once per distinct query string."""
+    return query.replace('?', '%s')
+
+def cache_key_hash(norm_text, dialect):
+    """Fixed-size cache primary key: 8-byte BLAKE2b digest of the normalized text and dialect."""
+    return hashlib.blake2b(f"{norm_text}|{dialect}".encode(), digest_size=8).digest()
+
+# ===== Cache Admission =====
+class CountMinSketch:
+    """TinyLFU frequency sketch over cache_key_hash digests: 4 rows of 2^14 saturating counters (64 KB).
+    
+    Every `sample_size` increments all counters are halved, so popularity fades with time. The
+    admission check is an absolute threshold rather than TinyLFU's candidate-vs-victim comparison,
+    so the sample stays at one increment per counter to keep collision noise below it.
+    """
+    DEPTH = 4
+    MAX_COUNT = 15
+
+    def __init__(self, width_bits=14, sample_factor=1):
+        self.mask = (1 << width_bits) - 1
+        self.rows = [bytearray(1 << width_bits) for _ in range(self.DEPTH)]
+        self.sample_size = sample_factor << width_bits
+        self.additions = 0
+
+    def _indexes(self, key):
+        # The digest is already uniformly random: each row takes its own 16-bit slice of it
+        h = int.from_bytes(key, 'little')
+        return [(h >> (16 * i)) & self.mask for i in range(self.DEPTH)]
+
+    def estimate(self, key):
+        return min(row[i] for row, i in zip(self.rows, self._indexes(key)))
+
+    def increment(self, key):
+        for row, i in zip(self.rows, self._indexes(key)):
+            if row[i] < self.MAX_COUNT:
+                row[i] += 1
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            self.rows = [bytearray(count >> 1 for count in row) for row in self.rows]
+            self.additions //= 2
+
+class EagerCursor:
+    """Rows fetched while the pooled connection was checked out, with the cursor read API."""
+    __slots__ = ('_rows', '_pos')
+
+    def __init__(self, rows):
+        self._rows = rows or []
+        self._pos = 0
+
+    async def fetchone(self):
+        if self._pos >= len(self._rows):
+            return None
+        row = self._rows[self._pos]
+        self._pos += 1
+        return row
+
+    async def fetchall(self):
+        rows = self._rows[self._pos:]
+        self._pos = len(self._rows)
+        return rows
+
 class Database:
     def __init__(self, db_path=DATABASE_PATH, db_url=DATABASE_URL):
         self.db_path = db_path
         self.db_url = db_url
         self._connection = None
+        # SQLite only: the write-behind flusher commits on its own connection, never mid-way through a request's transaction
+        self._writer_connection = None
+        self._pool = None
         self.is_pg = False
+        self.redis = None
+        self._rate_limit_script = None
+        # Write-through cache of per-user settings read on every message
+        self._user_cache = TTLCache(maxsize=10_000, ttl=300)
+        # Access tier and limits, checked on every update; invalidated by grant/revoke/add_admin
+        self._access_cache = TTLCache(maxsize=10_000, ttl=ACCESS_CACHE_TTL)
+        # Admin IDs, loaded on connect and kept current by add_admin/remove_admin
+        self.admin_ids = frozenset()
+        self._write_queue = asyncio.Queue()
+        self._writer_task = None
+        # Cache table admission filter and lookup counters (exported on /metrics)
+        self._admission = CountMinSketch() if CACHE_ADMISSION_THRESHOLD > 1 else None
+        self.cache_lookups = 0
+        self.cache_lookup_hits = 0
+        self.cache_admission_rejects = 0
     
     async def connect(self, init_tables=True):
         if self.db_url:
@@ -30,87 +178,286 @@ class Database:
             self.db_url = self.db_url.strip("'").strip('"')
             
             try:
-                # PostgreSQL (psycopg 3)
-                self._connection = await psycopg.AsyncConnection.connect(self.db_url, autocommit=True)
+                # PostgreSQL (psycopg 3) - pooled so concurrent updates don't serialize on one socket
+                self._pool = AsyncConnectionPool(
+                    self.db_url,
+                    min_size=DB_POOL_MIN_SIZE,
+                    max_size=DB_POOL_MAX_SIZE,
+                    # Hot queries (cache, rate limit, access checks) become prepared statements after first use
+                    kwargs={'autocommit': True, 'prepare_threshold': DB_PREPARE_THRESHOLD},
+                    check=AsyncConnectionPool.check_connection,
+                    open=False
+                )
+                await self._pool.open(wait=True, timeout=30)
                 self.is_pg = True
                 logger.info("📡 Connected to external PostgreSQL database")
             except Exception as e:
                 logger.error(f"❌ Failed to connect to PostgreSQL: {e}. Falling back to SQLite.")
-                self._connection = await aiosqlite.connect(self.db_path)
+                if self._pool:
+                    await self._pool.close()
+                    self._pool = None
+                self._connection = await self._open_sqlite()
                 self.is_pg = False
         else:
             # SQLite
-            self._connection = await aiosqlite.connect(self.db_path)
+            self._connection = await self._open_sqlite()
             self.is_pg = False
             logger.info(f"💾 Using local SQLite database: {self.db_path}")
-
-        if not self.is_pg:
-            await self._connection.execute('PRAGMA foreign_keys = ON')
+        
+        if REDIS_URL and self.redis is None:
+            if aioredis is None:
+                logger.warning("⚠️ REDIS_URL is set but the redis package is not installed; rate limiting stays in the database")
+            else:
+                self.redis = aioredis.from_url(REDIS_URL)
+                self._rate_limit_script = self.redis.register_script(RATE_LIMIT_LUA)
+                logger.info("⚡ Using Redis for rate limiting")
         
         if init_tables:
             await self._create_tables()
+        await self.load_admin_ids()
+        
+        if self._writer_task is None:
+            if not self.is_pg:
+                self._writer_connection = await self._open_sqlite()
+            self._writer_task = asyncio.create_task(self._flusher())
+    
+    async def _open_sqlite(self):
+        conn = await aiosqlite.connect(self.db_path)
+        await conn.execute('PRAGMA foreign_keys = ON')
+        # WAL lets readers run during writes; NORMAL sync is safe under WAL and avoids an fsync per commit
+        await conn.execute('PRAGMA journal_mode = WAL')
+        await conn.execute('PRAGMA synchronous = NORMAL')
+        await conn.execute('PRAGMA temp_store = MEMORY')
+        await conn.execute('PRAGMA mmap_size = 268435456')
+        await conn.execute('PRAGMA cache_size = -64000')
+        return conn
+    
+    @property
+    def is_connected(self):
+        return (self._pool if self.is_pg else self._connection) is not None
     
     async def close(self):
+        if self._writer_task:
+            # Sentinel: the flusher writes what is queued, then exits
+            self._write_queue.put_nowait(None)
+            await self._writer_task
+            self._writer_task = None
+        if self._writer_connection:
+            try:
+                await self._writer_connection.close()
+            except:
+                pass
+            self._writer_connection = None
+        if self._pool:
+            try:
+                await self._pool.close()
+            except:
+                pass
+            self._pool = None
         if self._connection:
             try:
                 await self._connection.close()
             except:
                 pass
+            self._connection = None
+        if self.redis:
+            try:
+                await self.redis.aclose()
+            except:
+                pass
+            self.redis = None
     
     def _p(self, query):
         """Adapt placeholders to the current database engine."""
-        if self.is_pg:
-            return query.replace('?', '%s')
-        return query
+        return pg_placeholders(query) if self.is_pg else query
 
     async def execute(self, query, params=None):
-        """Unified execute method for both SQLite and PostgreSQL with auto-reconnect."""
+        """Unified execute method for both SQLite and PostgreSQL (pooled, retried once on a dropped connection)."""
         query = self._p(query)
         try:
             if self.is_pg:
-                return await self._connection.execute(query, params)
+                return await self._execute_pg(query, params)
             else:
                 return await self._connection.execute(query, params)
         except Exception as e:
-            # Check for PostgreSQL disconnection errors
+            # A server-side disconnect surfaces on the checked-out connection; the pool replaces it
             err_msg = str(e).lower()
             if self.is_pg and ("closed" in err_msg or "consuming input failed" in err_msg or "connection is closed" in err_msg):
-                logger.warning(f"🔄 Database connection lost ({e}). Reconnecting...")
+                logger.warning(f"🔄 Database connection lost ({e}). Retrying on a fresh pooled connection...")
                 try:
-                    await self.close()
-                    # Reconnect without re-initializing tables (to avoid recursion loop)
-                    await self.connect(init_tables=False)
-                    # Retry the query once
-                    logger.info("🔄 Reconnected. Retrying query...")
-                    return await self._connection.execute(query, params)
-                except Exception as reconnect_error:
-                    logger.error(f"❌ Reconnect failed: {reconnect_error}")
+                    return await self._execute_pg(query, params)
+                except Exception as retry_error:
+                    logger.error(f"❌ Retry failed: {retry_error}")
                     raise
             
-            logger.error(f"Database Error: {e} | Query: {query} | Params: {params}")
+            logger.error("Database Error: %s | Query: %s | Params: %s", e, query, params)
             raise
 
+    async def _execute_pg(self, query, params):
+        """Run a query on a pooled connection and return its rows before the connection goes back."""
+        async with self._pool.connection() as conn:
+            cursor = await conn.execute(query, params)
+            rows = await cursor.fetchall() if cursor.description else None
+        return EagerCursor(rows)
+
     async def commit(self):
         """Unified commit (PostgreSQL in autocommit mode doesn't need it, but SQLite does)."""
         if not self.is_pg and self._connection:
             await self._connection.commit()
 
+    async def rollback(self):
+        """Unified rollback (no-op in PostgreSQL autocommit mode)."""
+        if not self.is_pg and self._connection:
+            await self._connection.rollback()
+
+    async def executemany(self, query, params_seq):
+        """Unified executemany: one batched call instead of a Python loop of executes."""
+        query = self._p(query)
+        if self.is_pg:
+            async with self._pool.connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.executemany(query, params_seq)
+        else:
+            await self._connection.executemany(query, params_seq)
+
+    async def _queue_write(self, kind, params):
+        """Hand a write to the background flusher (or run it inline when no flusher is running)."""
+        if self._writer_task is None:
+            await self.execute(WRITE_STATEMENTS[kind], params)
+            await self.commit()
+        else:
+            self._write_queue.put_nowait((kind, params))
+
+    async def _flusher(self):
+        """Drain queued writes every WRITE_BATCH_WINDOW and apply each batch in one transaction."""
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._write_queue.get()
+            batch = []
+            if item is None:
+                stopping = True
+            else:
+                batch.append(item)
+                deadline = loop.time() + WRITE_BATCH_WINDOW
+                while len(batch) < WRITE_BATCH_SIZE:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._write_queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                    if item is None:
+                        stopping = True
+                        break
+                    batch.append(item)
+            
+            # On shutdown, take whatever else is already queued
+            while stopping and not self._write_queue.empty():
+                item = self._write_queue.get_nowait()
+                if item is not None:
+                    batch.append(item)
+            
+            if batch:
+                try:
+                    await self._write_batch(batch)
+                except Exception as e:
+                    logger.error(f"❌ Write-behind flush failed ({len(batch)} writes dropped): {e}")
+
+    async def _write_batch(self, batch):
+        groups = {kind: [] for kind in WRITE_STATEMENTS}
+        for kind, params in batch:
+            groups[kind].append(params)
+        
+        # Collapse repeated cache hits into one increment per key
+        hits = {}
+        for (count, key) in groups['cache_hit']:
+            hits[key] = hits.get(key, 0) + count
+        groups['cache_hit'] = [(count, key) for key, count in hits.items()]
+        
+        if self.is_pg:
+            async with self._pool.connection() as conn:
+                async with conn.transaction():
+                    async with conn.cursor() as cursor:
+                        for kind, rows in groups.items():
+                            if not rows:
+                                continue
+                            if kind in COPY_STATEMENTS:
+                                async with cursor.copy(COPY_STATEMENTS[kind]) as copy:
+                                    for row in rows:
+                                        await copy.write_row(row)
+                            else:
+                                await cursor.executemany(self._p(WRITE_STATEMENTS[kind]), rows)
+        else:
+            # The writer connection waits out a request's open write transaction (busy timeout) rather than joining it
+            conn = self._writer_connection
+            try:
+                for kind, rows in groups.items():
+                    if rows:
+                        await conn.executemany(WRITE_STATEMENTS[kind], rows)
+                await conn.commit()
+            except Exception:
+                await conn.rollback()
+                raise
+
+    async def _migrate_rate_limits(self):
+        """Drop a fixed-window rate_limits table (window_start column); it is recreated with sliding-window buckets.
+        
+        Rows only hold the current window, so the worst case is users getting a fresh window once.
+        """
+        if self.is_pg:
+            cursor = await self.execute(
+                "SELECT 1 FROM information_schema.columns WHERE table_name = 'rate_limits' AND column_name = 'window_start'"
+            )
+        else:
+            cursor = await self.execute("SELECT 1 FROM pragma_table_info('rate_limits') WHERE name = 'window_start'")
+        if await cursor.fetchone():
+            logger.info("🔄 Migrating rate_limits to sliding-window buckets")
+            await self.execute('DROP TABLE rate_limits')
+            await self.commit()
+
+    async def _migrate_cache(self):
+        """Pull rows out of a cache table keyed on (text, dialect) and drop it; returns them re-keyed by hash.
+        
+        The table is recreated with the text_hash key and the rows are reinserted, so hit counts survive.
+        """
+        if self.is_pg:
+            cursor = await self.execute(
+                "SELECT column_name FROM information_schema.columns WHERE table_name = 'cache'"
+            )
+        else:
+            cursor = await self.execute("SELECT name FROM pragma_table_info('cache')")
+        columns = {row[0] for row in await cursor.fetchall()}
+        if not columns or 'text_hash' in columns:
+            return []
+        
+        logger.info("🔄 Migrating cache table to hashed keys")
+        cursor = await self.execute('SELECT text, dialect, translation, hit_count, created_at, last_used FROM cache')
+        rows = [(cache_key_hash(normalize_text(r[0]), r[1]), normalize_text(r[0])) + tuple(r[1:]) for r in await cursor.fetchall()]
+        await self.execute('DROP TABLE cache')
+        # Counters are reseeded empty and rebuilt by the triggers as the rows go back in
+        await self.execute('DROP TABLE IF EXISTS cache_meta')
+        await self.commit()
+        return rows
+
     async def _create_tables(self):
         # Shared types/syntax adjustments
         serial_type = "SERIAL PRIMARY KEY" if self.is_pg else "INTEGER PRIMARY KEY AUTOINCREMENT"
+        blob_type = "BYTEA" if self.is_pg else "BLOB"
         
-        # 1. Users table
-        await self.execute('''
+        ddl = [
+            # 1. Users table
+            '''
             CREATE TABLE IF NOT EXISTS users (
                 user_id BIGINT PRIMARY KEY,
                 dialect TEXT DEFAULT 'standard',
                 context_mode INTEGER DEFAULT 1,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
-        ''')
-        
-        # 2. History table
-        await self.execute(f'''
+            ''',
+            # 2. History table
+            f'''
             CREATE TABLE IF NOT EXISTS history (
                 id {serial_type},
                 user_id BIGINT,
@@ -118,10 +465,9 @@ class Database:
                 time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
             )
-        ''')
-        
-        # 3. Favorites table
-        await self.execute(f'''
+            ''',
+            # 3. Favorites table
+            f'''
             CREATE TABLE IF NOT EXISTS favorites (
                 id {serial_type},
                 user_id BIGINT,
@@ -129,32 +475,30 @@ class Database:
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
             )
-        ''')
-        
-        # 4. Cache table
-        await self.execute('''
+            ''',
+            # 4. Cache table (keyed by cache_key_hash)
+            f'''
             CREATE TABLE IF NOT EXISTS cache (
+                text_hash {blob_type} PRIMARY KEY,
                 text TEXT,
                 dialect TEXT DEFAULT 'standard',
                 translation TEXT NOT NULL,
                 hit_count INTEGER DEFAULT 1,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                last_used TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                PRIMARY KEY (text, dialect)
+                last_used TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
-        ''')
-        
-        # 5. Rate limits table
-        await self.execute('''
+            ''',
+            # 5. Rate limits table (sliding window: counts for the current and previous epoch bucket)
+            '''
             CREATE TABLE IF NOT EXISTS rate_limits (
                 user_id BIGINT PRIMARY KEY,
-                request_count INTEGER DEFAULT 0,
-                window_start TEXT
+                bucket BIGINT,
+                cur_count INTEGER DEFAULT 0,
+                prev_count INTEGER DEFAULT 0
             )
-        ''')
-        
-        # 6. Admin users table
-        await self.execute('''
+            ''',
+            # 6. Admin users table
+            '''
             CREATE TABLE IF NOT EXISTS admin_users (
                 user_id BIGINT PRIMARY KEY,
                 username TEXT,
@@ -162,10 +506,9 @@ class Database:
                 can_grant_access INTEGER DEFAULT 0,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
-        ''')
-        
-        # 7. Packages table
-        await self.execute(f'''
+            ''',
+            # 7. Packages table
+            f'''
             CREATE TABLE IF NOT EXISTS packages (
                 package_id {serial_type},
                 name TEXT NOT NULL,
@@ -176,10 +519,9 @@ class Database:
                 duration_days INTEGER DEFAULT 30,
                 is_active INTEGER DEFAULT 1
             )
-        ''')
-        
-        # 8. Subscriptions table
-        await self.execute(f'''
+            ''',
+            # 8. Subscriptions table
+            f'''
             CREATE TABLE IF NOT EXISTS user_subscriptions (
                 subscription_id {serial_type},
                 user_id BIGINT,
@@ -192,10 +534,9 @@ class Database:
                 FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE,
                 FOREIGN KEY (package_id) REFERENCES packages(package_id) ON DELETE CASCADE
             )
-        ''')
-
-        # 9. Feedback table
-        await self.execute(f'''
+            ''',
+            # 9. Feedback table
+            f'''
             CREATE TABLE IF NOT EXISTS feedback (
                 id {serial_type},
                 user_id BIGINT,
@@ -207,10 +548,9 @@ class Database:
                 status TEXT DEFAULT 'pending',
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
-        ''')
-
-        # 10. Verified Translations table
-        await self.execute(f'''
+            ''',
+            # 10. Verified Translations table
+            f'''
             CREATE TABLE IF NOT EXISTS verified_translations (
                 id {serial_type},
                 text TEXT,
@@ -219,7 +559,96 @@ class Database:
                 approved_by BIGINT,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
-        ''')
+            ''',
+            # Indexes for per-user lookups (history pages by id, newest first)
+            'DROP INDEX IF EXISTS idx_history_user_time',
+            'DROP INDEX IF EXISTS idx_favorites_user',
+            'CREATE INDEX IF NOT EXISTS idx_history_user_id ON history (user_id, id DESC)',
+            'CREATE INDEX IF NOT EXISTS idx_favorites_user_created ON favorites (user_id, created_at DESC)',
+            # Partial index: access checks only ever read active subscriptions
+            'DROP INDEX IF EXISTS idx_user_subs_user_active',
+            'CREATE INDEX IF NOT EXISTS idx_user_subs_active ON user_subscriptions (user_id) WHERE is_active = 1',
+            # Partial index: the review queue only ever reads pending rows, oldest first
+            "CREATE INDEX IF NOT EXISTS idx_feedback_pending ON feedback (created_at) WHERE status = 'pending'",
+            # Newest users first (admin viewer); users are inserted once, so the index is nearly free to keep
+            'CREATE INDEX IF NOT EXISTS idx_users_created ON users (created_at DESC)',
+            # Migrate the old free-tier limit
+            'UPDATE packages SET translations_limit = 14 WHERE package_id = 1 AND translations_limit = 10',
+            # 11. Cache counters: one row kept current by triggers, so stats never scan the cache table
+            '''
+            CREATE TABLE IF NOT EXISTS cache_meta (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                total_entries BIGINT DEFAULT 0,
+                total_hits BIGINT DEFAULT 0
+            )
+            ''',
+            # Seeded from the cache table once; the triggers take over from there
+            'INSERT INTO cache_meta (id, total_entries, total_hits) '
+            'SELECT 1, COUNT(*), COALESCE(SUM(hit_count), 0) FROM cache WHERE true ON CONFLICT (id) DO NOTHING',
+            # 12. Bot metadata (small key/value facts about the bot itself, e.g. the last command-set hash)
+            '''
+            CREATE TABLE IF NOT EXISTS bot_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+            ''',
+            # 13. PTB per-user conversation state (pickled user_data, e.g. a pending feedback correction)
+            f'''
+            CREATE TABLE IF NOT EXISTS user_state (
+                user_id BIGINT PRIMARY KEY,
+                data {blob_type} NOT NULL
+            )
+            ''',
+        ]
+        if self.is_pg:
+            ddl += [
+                '''
+                CREATE OR REPLACE FUNCTION cache_meta_sync() RETURNS trigger AS $$
+                BEGIN
+                    IF TG_OP = 'INSERT' THEN
+                        UPDATE cache_meta SET total_entries = total_entries + 1, total_hits = total_hits + NEW.hit_count WHERE id = 1;
+                    ELSIF TG_OP = 'UPDATE' THEN
+                        UPDATE cache_meta SET total_hits = total_hits + NEW.hit_count - OLD.hit_count WHERE id = 1;
+                    ELSE
+                        UPDATE cache_meta SET total_entries = total_entries - 1, total_hits = total_hits - OLD.hit_count WHERE id = 1;
+                    END IF;
+                    RETURN NULL;
+                END
+                $$ LANGUAGE plpgsql
+                ''',
+                'DROP TRIGGER IF EXISTS cache_meta_sync ON cache',
+                'CREATE TRIGGER cache_meta_sync AFTER INSERT OR DELETE OR UPDATE OF hit_count ON cache '
+                'FOR EACH ROW EXECUTE FUNCTION cache_meta_sync()',
+            ]
+        else:
+            ddl += [
+                '''
+                CREATE TRIGGER IF NOT EXISTS cache_meta_insert AFTER INSERT ON cache BEGIN
+                    UPDATE cache_meta SET total_entries = total_entries + 1, total_hits = total_hits + NEW.hit_count WHERE id = 1;
+                END
+                ''',
+                '''
+                CREATE TRIGGER IF NOT EXISTS cache_meta_hits AFTER UPDATE OF hit_count ON cache BEGIN
+                    UPDATE cache_meta SET total_hits = total_hits + NEW.hit_count - OLD.hit_count WHERE id = 1;
+                END
+                ''',
+                '''
+                CREATE TRIGGER IF NOT EXISTS cache_meta_delete AFTER DELETE ON cache BEGIN
+                    UPDATE cache_meta SET total_entries = total_entries - 1, total_hits = total_hits - OLD.hit_count WHERE id = 1;
+                END
+                ''',
+            ]
+        script = ";\n".join(ddl)
+        
+        await self._migrate_rate_limits()
+        legacy_cache = await self._migrate_cache()
+        
+        if self.is_pg:
+            # Parameterless multi-statement query: one round trip, one implicit transaction
+            await self.execute(script)
+        else:
+            # One transaction, so SQLite syncs once instead of once per statement
+            await self._connection.executescript(f"BEGIN;\n{script};\nCOMMIT;")
         
         # Insert default packages
         packages_data = [
@@ -229,33 +658,43 @@ class Database:
             (4, 'Unlimited', 'Unlimited translations', 999999, 60, 19.99, 30)
         ]
         
-        for pkg in packages_data:
-            if self.is_pg:
-                await self.execute(
-                    'INSERT INTO packages (package_id, name, description, translations_limit, window_minutes, price_usd, duration_days) '
-                    'VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (package_id) DO NOTHING',
-                    pkg
-                )
-            else:
-                await self.execute(
-                    'INSERT OR IGNORE INTO packages (package_id, name, description, translations_limit, window_minutes, price_usd, duration_days) '
-                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
-                    pkg
-                )
+        if self.is_pg:
+            insert_sql = (
+                'INSERT INTO packages (package_id, name, description, translations_limit, window_minutes, price_usd, duration_days) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (package_id) DO NOTHING'
+            )
+        else:
+            insert_sql = (
+                'INSERT OR IGNORE INTO packages (package_id, name, description, translations_limit, window_minutes, price_usd, duration_days) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)'
+            )
+        await self.executemany(insert_sql, packages_data)
         
-        await self.execute('UPDATE packages SET translations_limit = 14 WHERE package_id = 1 AND translations_limit = 10')
+        if legacy_cache:
+            await self.executemany(
+                'INSERT INTO cache (text_hash, text, dialect, translation, hit_count, created_at, last_used) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (text_hash) DO NOTHING',
+                legacy_cache
+            )
         await self.commit()
     
     async def get_user(self, user_id):
+        user = self._user_cache.get(user_id)
+        if user is not None:
+            return user
+        
         cursor = await self.execute('SELECT dialect, context_mode FROM users WHERE user_id = ?', (user_id,))
         row = await cursor.fetchone()
         
         if not row:
             await self.execute('INSERT INTO users (user_id) VALUES (?)', (user_id,))
             await self.commit()
-            return {'dialect': 'standard', 'context_mode': True}
+            user = {'dialect': 'standard', 'context_mode': True}
+        else:
+            user = {'dialect': row[0], 'context_mode': bool(row[1])}
         
-        return {'dialect': row[0], 'context_mode': bool(row[1])}
+        self._user_cache[user_id] = user
+        return user
     
     async def update_user_dialect(self, user_id, dialect):
         if self.is_pg:
@@ -266,19 +705,19 @@ class Database:
         else:
             await self.execute('INSERT OR REPLACE INTO users (user_id, dialect) VALUES (?, ?)', (user_id, dialect))
         await self.commit()
+        self._user_cache.pop(user_id, None)
     
-    async def get_history(self, user_id, limit=10):
+    async def get_history(self, user_id, limit=10, offset=0):
+        """Newest-first (text, 'HH:MM') tuples, served by idx_history_user_id."""
         time_func = 'TO_CHAR(time, \'HH24:MI\')' if self.is_pg else 'strftime("%H:%M", time)'
-        cursor = await self.execute(f'SELECT text, {time_func} as time FROM history WHERE user_id = ? ORDER BY time DESC LIMIT ?', (user_id, limit))
-        rows = await cursor.fetchall()
-        return [{'text': row[0], 'time': row[1]} for row in rows]
+        cursor = await self.execute(f'SELECT text, {time_func} as time FROM history WHERE user_id = ? ORDER BY id DESC LIMIT ? OFFSET ?', (user_id, limit, offset))
+        return await cursor.fetchall()
     
     async def add_history(self, user_id, text):
-        await self.execute('INSERT INTO history (user_id, text) VALUES (?, ?)', (user_id, text))
-        await self.commit()
+        await self._queue_write('history', (user_id, text))
     
-    async def get_favorites(self, user_id):
-        cursor = await self.execute('SELECT text FROM favorites WHERE user_id = ? ORDER BY created_at DESC', (user_id,))
+    async def get_favorites(self, user_id, limit=10, offset=0):
+        cursor = await self.execute('SELECT text FROM favorites WHERE user_id = ? ORDER BY created_at DESC LIMIT ? OFFSET ?', (user_id, limit, offset))
         rows = await cursor.fetchall()
         return [row[0] for row in rows]
     
@@ -288,80 +727,147 @@ class Database:
         await self.execute('INSERT INTO favorites (user_id, text) VALUES (?, ?)', (user_id, text))
         await self.commit(); return True
     
-    async def get_cached_translation(self, text, dialect='standard'):
-        cursor = await self.execute('SELECT translation FROM cache WHERE text = ? AND dialect = ?', (text.lower().strip(), dialect))
+    async def get_cached_translation(self, norm_text, dialect='standard'):
+        """Look up a cached translation; norm_text must already be utils.normalize_text'd."""
+        key = cache_key_hash(norm_text, dialect)
+        self.cache_lookups += 1
+        cursor = await self.execute('SELECT translation FROM cache WHERE text_hash = ?', (key,))
         row = await cursor.fetchone()
         if row:
-            await self.execute('UPDATE cache SET hit_count = hit_count + 1, last_used = CURRENT_TIMESTAMP WHERE text = ? AND dialect = ?', (text.lower().strip(), dialect))
-            await self.commit(); return row[0]
+            self.cache_lookup_hits += 1
+            await self._queue_write('cache_hit', (1, key))
+            return row[0]
+        if self._admission:
+            self._admission.increment(key)
         return None
     
-    async def cache_translation(self, text, dialect, translation):
+    async def cache_translation(self, norm_text, dialect, translation):
+        key = cache_key_hash(norm_text, dialect)
+        # One-hit wonders stay out of the table: admit only texts that keep coming back
+        if self._admission and self._admission.estimate(key) < CACHE_ADMISSION_THRESHOLD:
+            self.cache_admission_rejects += 1
+            return
         try:
-            if self.is_pg:
-                await self.execute('INSERT INTO cache (text, dialect, translation) VALUES (?, ?, ?) ON CONFLICT (text, dialect) DO UPDATE SET translation = EXCLUDED.translation, last_used = CURRENT_TIMESTAMP', (text.lower().strip(), dialect, translation))
-            else:
-                await self.execute('INSERT OR REPLACE INTO cache (text, dialect, translation) VALUES (?, ?, ?)', (text.lower().strip(), dialect, translation))
-            await self.commit()
-        except Exception as e: logger.error(f"Cache error: {e}")
+            await self._queue_write('cache', (key, norm_text, dialect, translation))
+        except Exception as e: logger.error("Cache error: %s", e)
     
     async def get_cache_stats(self):
         try:
-            cursor = await self.execute('SELECT COUNT(*) FROM cache')
-            row = await cursor.fetchone()
-            total = row[0] if row else 0
-            
-            cursor = await self.execute('SELECT SUM(hit_count) FROM cache')
+            cursor = await self.execute('SELECT total_entries, total_hits FROM cache_meta WHERE id = 1')
             row = await cursor.fetchone()
-            hits = row[0] if row and row[0] is not None else 0
-            
-            cursor = await self.execute('SELECT COUNT(*) FROM cache WHERE hit_count > 0')
-            row = await cursor.fetchone()
-            used = row[0] if row else 0
+            total, hits = row if row else (0, 0)
             
             return {
                 'total_entries': total, 
                 'total_hits': hits,
-                'used_entries': used
+                # hit_count starts at 1 and only grows, so every entry has been used
+                'used_entries': total
             }
         except Exception as e:
             logger.error(f"Error getting cache stats: {e}")
             return {'total_entries': 0, 'total_hits': 0, 'used_entries': 0}
 
     async def check_rate_limit(self, user_id, max_requests=10, window_minutes=60):
-        cursor = await self.execute('SELECT request_count, window_start FROM rate_limits WHERE user_id = ?', (user_id,))
-        row = await cursor.fetchone(); now = datetime.now()
-        if not row:
-            await self.execute('INSERT INTO rate_limits (user_id, request_count, window_start) VALUES (?, 1, ?)', (user_id, now.isoformat()))
-            await self.commit(); return True, max_requests - 1, window_minutes
-        request_count, window_start = row
-        window_start = datetime.fromisoformat(window_start)
-        time_elapsed = (now - window_start).total_seconds() / 60
-        if time_elapsed >= window_minutes:
-            await self.execute('UPDATE rate_limits SET request_count = 1, window_start = ? WHERE user_id = ?', (now.isoformat(), user_id))
-            await self.commit(); return True, max_requests - 1, window_minutes
-        if request_count >= max_requests: return False, 0, window_minutes - int(time_elapsed)
-        await self.execute('UPDATE rate_limits SET request_count = request_count + 1 WHERE user_id = ?', (user_id,))
-        await self.commit(); return True, max_requests - request_count - 1, window_minutes - int(time_elapsed)
+        window_seconds = window_minutes * 60
+        now_ts = int(time.time())
+        bucket = now_ts // window_seconds
+        if self._rate_limit_script and self.redis:
+            try:
+                cur_count, prev_count = await self._rate_limit_script(
+                    keys=[f"rl:{user_id}:{window_seconds}:{bucket}", f"rl:{user_id}:{window_seconds}:{bucket - 1}"],
+                    args=[window_seconds * 2, repr(1 - now_ts % window_seconds / window_seconds), max_requests]
+                )
+                return sliding_window_limit(int(cur_count), int(prev_count), now_ts, window_seconds, max_requests)
+            except Exception as e:
+                logger.warning("⚠️ Redis rate limit failed, falling back to database: %s", e)
+        
+        # Single atomic UPSERT: roll the buckets forward if needed, then count this request
+        cursor = await self.execute(
+            'INSERT INTO rate_limits (user_id, bucket, cur_count, prev_count) VALUES (?, ?, 1, 0) '
+            'ON CONFLICT (user_id) DO UPDATE SET '
+            'prev_count = CASE WHEN excluded.bucket = rate_limits.bucket THEN rate_limits.prev_count '
+            'WHEN excluded.bucket = rate_limits.bucket + 1 THEN rate_limits.cur_count ELSE 0 END, '
+            'cur_count = CASE WHEN excluded.bucket = rate_limits.bucket THEN rate_limits.cur_count + 1 ELSE 1 END, '
+            'bucket = excluded.bucket '
+            'RETURNING cur_count, prev_count',
+            (user_id, bucket)
+        )
+        cur_count, prev_count = await cursor.fetchone()
+        result = sliding_window_limit(cur_count, prev_count, now_ts, window_seconds, max_requests)
+        if not result[0]:
+            # Denied requests don't count, or retrying while limited would push the reset further out
+            await self.execute(
+                'UPDATE rate_limits SET cur_count = cur_count - 1 WHERE user_id = ? AND bucket = ?',
+                (user_id, bucket)
+            )
+        await self.commit()
+        return result
 
-    async def is_user_allowed(self, user_id):
-        cursor = await self.execute('SELECT 1 FROM admin_users WHERE user_id = ?', (user_id,))
-        if await cursor.fetchone(): return True, "admin"
+    def invalidate_access(self, user_id):
+        """Drop cached access tier and limits after a grant, revoke or admin change."""
+        self._access_cache.pop(user_id, None)
+
+    async def _get_access(self, user_id):
+        """Cached ((allowed, access_type), limits) for a user."""
+        entry = self._access_cache.get(user_id)
+        if entry is None:
+            entry = self._access_cache[user_id] = await self._load_access(user_id)
+        return entry
+
+    async def _load_access(self, user_id):
+        """Admin flag and best active subscription in one query."""
         end_check = "s.end_date > CURRENT_TIMESTAMP" if self.is_pg else "s.end_date > datetime('now')"
-        cursor = await self.execute(f'SELECT s.subscription_id, p.name FROM user_subscriptions s JOIN packages p ON s.package_id = p.package_id WHERE s.user_id = ? AND s.is_active = 1 AND (s.end_date IS NULL OR {end_check})', (user_id,))
-        row = await cursor.fetchone()
-        if row: return True, row[1]
-        # Open access for everyone (default to free tier)
-        return True, "free"
+        cursor = await self.execute(
+            'SELECT (SELECT 1 FROM admin_users WHERE user_id = ?), sub.name, sub.translations_limit, sub.window_minutes, sub.price_usd '
+            'FROM (SELECT 1) AS one LEFT JOIN ('
+            'SELECT p.name, p.translations_limit, p.window_minutes, p.price_usd FROM user_subscriptions s '
+            'JOIN packages p ON s.package_id = p.package_id '
+            f'WHERE s.user_id = ? AND s.is_active = 1 AND (s.end_date IS NULL OR {end_check}) '
+            'ORDER BY p.translations_limit DESC LIMIT 1'
+            ') AS sub ON TRUE',
+            (user_id, user_id)
+        )
+        is_admin, name, limit, window, price = await cursor.fetchone()
+        
+        # Admins are always "admin" for access, but an explicit subscription sets their limits
+        if is_admin: access = (True, "admin")
+        elif name: access = (True, name)
+        else: access = (True, "free")  # Open access for everyone (default to free tier)
+        
+        if name: limits = {'limit': limit, 'window': window, 'tier': name, 'price': price}
+        elif is_admin: limits = {'limit': 999999, 'window': 60, 'tier': 'admin', 'price': 0}
+        else: limits = {'limit': 14, 'window': 60, 'tier': 'free', 'price': 0}
+        return access, limits
+
+    async def is_user_allowed(self, user_id):
+        access, _ = await self._get_access(user_id)
+        return access
 
     async def get_user_limits(self, user_id):
-        end_check = "s.end_date > CURRENT_TIMESTAMP" if self.is_pg else "s.end_date > datetime('now')"
-        cursor = await self.execute(f'SELECT p.translations_limit, p.window_minutes, p.name, p.price_usd FROM user_subscriptions s JOIN packages p ON s.package_id = p.package_id WHERE s.user_id = ? AND s.is_active = 1 AND (s.end_date IS NULL OR {end_check}) ORDER BY p.translations_limit DESC LIMIT 1', (user_id,))
-        row = await cursor.fetchone()
-        if row: return {'limit': row[0], 'window': row[1], 'tier': row[2], 'price': row[3]}
-        cursor = await self.execute('SELECT 1 FROM admin_users WHERE user_id = ?', (user_id,))
-        if await cursor.fetchone(): return {'limit': 999999, 'window': 60, 'tier': 'admin', 'price': 0}
-        return {'limit': 14, 'window': 60, 'tier': 'free', 'price': 0}
+        _, limits = await self._get_access(user_id)
+        return limits
+
+    async def begin_request(self, user_id):
+        """Everything a translation request needs before work starts: access, tier limits and a rate-limit slot.
+        
+        Access and limits come from cache (one query on a miss), then one UPSERT claims the rate-limit slot.
+        """
+        (is_allowed, access_type), limits = await self._get_access(user_id)
+        request = {'allowed': is_allowed, 'access_type': access_type, **limits}
+        if not is_allowed:
+            return request
+        within_limit, remaining, reset_minutes = await self.check_rate_limit(
+            user_id, max_requests=limits['limit'], window_minutes=limits['window']
+        )
+        request.update(within_limit=within_limit, remaining=remaining, reset_minutes=reset_minutes)
+        return request
+
+    async def load_admin_ids(self):
+        cursor = await self.execute('SELECT user_id FROM admin_users')
+        self.admin_ids = frozenset(row[0] for row in await cursor.fetchall())
+
+    def is_admin(self, user_id):
+        return user_id in self.admin_ids
 
     async def add_admin(self, user_id, username=None, can_grant_access=False):
         try:
@@ -369,21 +875,34 @@ class Database:
                 await self.execute('INSERT INTO admin_users (user_id, username, can_grant_access) VALUES (?, ?, ?) ON CONFLICT (user_id) DO UPDATE SET username = EXCLUDED.username, can_grant_access = EXCLUDED.can_grant_access', (user_id, username, 1 if can_grant_access else 0))
             else:
                 await self.execute('INSERT OR REPLACE INTO admin_users (user_id, username, can_grant_access) VALUES (?, ?, ?)', (user_id, username, 1 if can_grant_access else 0))
-            await self.commit(); return True
+            await self.commit()
+            self.admin_ids = self.admin_ids | {user_id}
+            self.invalidate_access(user_id); return True
         except Exception as e: logger.error(f"Error adding admin: {e}"); return False
 
+    async def remove_admin(self, user_id):
+        try:
+            cursor = await self.execute('DELETE FROM admin_users WHERE user_id = ? RETURNING user_id', (user_id,))
+            removed = await cursor.fetchone()
+            await self.commit()
+            self.admin_ids = self.admin_ids - {user_id}
+            self.invalidate_access(user_id); return removed is not None
+        except Exception as e: logger.error(f"Error removing admin: {e}"); return False
+
     async def grant_access(self, user_id, package_id=1, duration_days=30):
         try:
             end_date = None if duration_days > 1000 else datetime.now().timestamp() + (duration_days * 86400)
             date_conv = "TO_TIMESTAMP(?)" if self.is_pg else "datetime(?, 'unixepoch')"
             await self.execute(f'INSERT INTO user_subscriptions (user_id, package_id, end_date, is_active) VALUES (?, ?, {date_conv}, 1)', (user_id, package_id, end_date))
-            await self.commit(); return True
+            await self.commit()
+            self.invalidate_access(user_id); return True
         except Exception as e: logger.error(f"Error granting access: {e}"); return False
 
     async def revoke_access(self, user_id):
         try:
             await self.execute('UPDATE user_subscriptions SET is_active = 0 WHERE user_id = ?', (user_id,))
-            await self.commit(); return True
+            await self.commit()
+            self.invalidate_access(user_id); return True
         except Exception as e: logger.error(f"Error revoking access: {e}"); return False
 
     async def get_all_packages(self):
@@ -398,6 +917,14 @@ class Database:
         return None
 
     # Feedback and Verification Methods
+    async def get_next_pending_feedback(self):
+        """Oldest pending feedback row (id, original, generated, suggested, dialect), or None."""
+        cursor = await self.execute(
+            "SELECT id, original_text, generated_translation, suggested_translation, dialect FROM feedback "
+            "WHERE status = 'pending' ORDER BY created_at ASC LIMIT 1"
+        )
+        return await cursor.fetchone()
+
     async def add_feedback(self, user_id, original_text, generated_translation, suggested_translation, dialect, feedback_type='incorrect'):
         try:
             await self.execute(
@@ -420,25 +947,87 @@ class Database:
             return row[0]
         return None
 
+    def _verified_upsert(self, text, translation, dialect, approved_by):
+        """(query, params) that insert or replace a verified translation."""
+        normalized_text = text.lower().strip().rstrip('?').rstrip('!').rstrip('.')
+        if self.is_pg:
+            query = 'INSERT INTO verified_translations (text, dialect, translation, approved_by) VALUES (?, ?, ?, ?) ON CONFLICT (text, dialect) DO UPDATE SET translation = EXCLUDED.translation'
+        else:
+            query = 'INSERT OR REPLACE INTO verified_translations (text, dialect, translation, approved_by) VALUES (?, ?, ?, ?)'
+        return query, (normalized_text, dialect, translation, approved_by)
+
+    async def _upsert_verified_translation(self, text, translation, dialect, approved_by):
+        await self.execute(*self._verified_upsert(text, translation, dialect, approved_by))
+
     async def add_verified_translation(self, text, translation, dialect='standard', approved_by=None):
         try:
-            normalized_text = text.lower().strip().rstrip('?').rstrip('!').rstrip('.')
-            if self.is_pg:
-                await self.execute(
-                    'INSERT INTO verified_translations (text, dialect, translation, approved_by) VALUES (?, ?, ?, ?) ON CONFLICT (text, dialect) DO UPDATE SET translation = EXCLUDED.translation',
-                    (normalized_text, dialect, translation, approved_by)
-                )
-            else:
-                await self.execute(
-                    'INSERT OR REPLACE INTO verified_translations (text, dialect, translation, approved_by) VALUES (?, ?, ?, ?)',
-                    (normalized_text, dialect, translation, approved_by)
-                )
+            await self._upsert_verified_translation(text, translation, dialect, approved_by)
             await self.commit()
             return True
         except Exception as e:
             logger.error(f"Error adding verified translation: {e}")
             return False
 
+    async def approve_feedback(self, feedback_id, approved_by=None):
+        """Mark feedback approved and verify its suggestion in one commit; None if the feedback doesn't exist."""
+        approve = "UPDATE feedback SET status = 'approved' WHERE id = ? RETURNING original_text, suggested_translation, dialect"
+        try:
+            if self.is_pg:
+                # The pool is in autocommit, so both statements share one connection and one transaction
+                async with self._pool.connection() as conn:
+                    async with conn.transaction():
+                        cursor = await conn.execute(self._p(approve), (feedback_id,))
+                        row = await cursor.fetchone()
+                        if row is None:
+                            return None
+                        query, params = self._verified_upsert(*row, approved_by)
+                        await conn.execute(self._p(query), params)
+                return True
+            
+            cursor = await self.execute(approve, (feedback_id,))
+            row = await cursor.fetchone()
+            if row is None:
+                return None
+            await self._upsert_verified_translation(*row, approved_by)
+            await self.commit()
+            return True
+        except Exception as e:
+            await self.rollback()
+            logger.error(f"Error approving feedback: {e}")
+            return False
+
+    async def reject_feedback(self, feedback_id):
+        await self.execute("UPDATE feedback SET status = 'rejected' WHERE id = ?", (feedback_id,))
+        await self.commit()
+
+    async def get_meta(self, key):
+        cursor = await self.execute('SELECT value FROM bot_meta WHERE key = ?', (key,))
+        row = await cursor.fetchone()
+        return row[0] if row else None
+
+    async def set_meta(self, key, value):
+        await self.execute(
+            'INSERT INTO bot_meta (key, value) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value',
+            (key, value)
+        )
+        await self.commit()
+
+    async def get_user_states(self):
+        """{user_id: pickled user_data} for every user with saved conversation state."""
+        cursor = await self.execute('SELECT user_id, data FROM user_state')
+        return {user_id: bytes(data) for user_id, data in await cursor.fetchall()}
+
+    async def set_user_state(self, user_id, data):
+        await self.execute(
+            'INSERT INTO user_state (user_id, data) VALUES (?, ?) ON CONFLICT (user_id) DO UPDATE SET data = EXCLUDED.data',
+            (user_id, data)
+        )
+        await self.commit()
+
+    async def delete_user_state(self, user_id):
+        await self.execute('DELETE FROM user_state WHERE user_id = ?', (user_id,))
+        await self.commit()
+
     async def get_all_users(self):
         """Get all user IDs for broadcasting."""
         cursor = await self.execute('SELECT user_id FROM users')
@@ -1,12 +1,20 @@
 import asyncio
+import bisect
+import io
 import os
 import logging
 import re
+import shutil
 import uuid
 import tempfile
-import subprocess
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, constants, InlineQueryResultArticle, InputTextMessageContent
+import wave
+try:
+    import av
+except ImportError:
+    av = None
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InlineQueryResultArticle, InputTextMessageContent
 from telegram.ext import ContextTypes
+from cachetools import TTLCache
 
 from database import db
 from services import (
@@ -21,12 +29,34 @@ from config import (
     ADMIN_CONTACT,
     STRIPE_BASIC_LINK,
     STRIPE_PRO_LINK,
-    STRIPE_UNLIMITED_LINK
+    STRIPE_UNLIMITED_LINK,
+    TMP_DIR
 )
-from utils import split_message
+from utils import iter_split_message, count_words
 
 logger = logging.getLogger(__name__)
 
+# Probed once at import; non-voice audio is converted in-process with PyAV, or by the ffmpeg CLI without it
+FFMPEG_AVAILABLE = shutil.which('ffmpeg') is not None
+if av is None and not FFMPEG_AVAILABLE:
+    logger.warning("⚠️ Neither PyAV nor FFmpeg found; audio files and video notes can't be translated")
+
+def transcode_to_wav(data: bytes) -> bytes:
+    """Decode any audio/video container in-process and resample to 16 kHz mono 16-bit WAV."""
+    out = io.BytesIO()
+    resampler = av.AudioResampler(format='s16', layout='mono', rate=16000)
+    with av.open(io.BytesIO(data)) as container, wave.open(out, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(16000)
+        for frame in container.decode(audio=0):
+            for resampled in resampler.resample(frame):
+                wav.writeframes(bytes(resampled.planes[0])[:resampled.samples * 2])
+        # Flush samples still buffered in the resampler
+        for resampled in resampler.resample(None):
+            wav.writeframes(bytes(resampled.planes[0])[:resampled.samples * 2])
+    return out.getvalue()
+
 # Payment instructions template
 PAYMENT_INSTRUCTIONS = """
 💳 *Payment Options:*
@@ -43,13 +73,141 @@ PAYMENT_INSTRUCTIONS = """
 Send payment screenshot/receipt along with your User ID to @Erivative.
 """
 
+ADMIN_USERNAME = ADMIN_CONTACT.lstrip('@')
+
+ACCESS_RESTRICTED_TEXT = (
+    "🔒 *Access Restricted*\n\n"
+    "This bot is currently in private beta and requires an invitation to use.\n\n"
+    f"If you'd like to request access, please contact: {ADMIN_CONTACT}"
+)
+
+# Package icon by monthly price: below $10 ⭐, below $20 🚀, otherwise 💎
+PACKAGE_PRICE_THRESHOLDS = (10, 20)
+PACKAGE_ICONS = ('⭐', '🚀', '💎')
+
+HELP_TEMPLATE = (
+    "📖 *How to use this bot:*\n"
+    "• Send **English/French** text to get the Darja translation.\n"
+    "• Send **Arabic script** to get French and English translations.\n\n"
+    "✨ *Available Commands:*\n"
+    "/subscription - View your subscription status\n"
+    "/packages - View upgrade packages & pricing\n"
+    "/dialect - Change region (Algiers, Oran, etc.)\n"
+    "/history - See your last 10 translations\n"
+    "/saved - View your bookmarked items\n"
+    "/save - Reply to any translation with this to bookmark it\n"
+    "/stats - View cache statistics (admin)\n"
+    "/queue - View queue status (admin)\n"
+    "/dictionary - View offline dictionary words\n"
+    "/start - Restart the bot\n\n"
+    "⚠️ *Your Rate Limit:* {limit} translations per hour ({tier} tier)\n"
+    "⏱️ *Queue:* Translations are processed asynchronously\n"
+    "📚 *Offline:* Dictionary available when API fails"
+)
+
+# ===== Static Keyboards =====
+# Built once at import time and reused for every reply
+CONTACT_ADMIN_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("💬 Contact Admin for Access", url=f"https://t.me/{ADMIN_USERNAME}")]
+])
+
+DIALECT_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("Standard 🇩🇿", callback_data='dial_standard')],
+    [InlineKeyboardButton("Algiers 🏙️", callback_data='dial_algiers')],
+    [InlineKeyboardButton("Oran 🌅", callback_data='dial_oran')],
+    [InlineKeyboardButton("Constantine 🌉", callback_data='dial_constantine')]
+])
+
+UPGRADE_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("⭐ Upgrade to Basic - $4.99/mo", callback_data='upgrade_basic')],
+    [InlineKeyboardButton("🚀 Upgrade to Pro - $9.99/mo", callback_data='upgrade_pro')],
+    [InlineKeyboardButton("💎 Go Unlimited - $19.99/mo", callback_data='upgrade_unlimited')]
+])
+
+def _upgrade_offer(package_name, package_price, stripe_link):
+    """Pre-render an upgrade screen: text before and after the user ID, and its keyboard."""
+    pay_now_btn = f"🔗 *Pay Now:* [Click Here to Pay]({stripe_link})\n\n" if stripe_link else ""
+    head = (
+        f"💎 *Upgrade to {package_name}*\n\n"
+        f"Price: *{package_price}*\n\n"
+        f"{pay_now_btn}"
+        f"To upgrade via other methods, message: {ADMIN_CONTACT}\n\n"
+        f"📋 *Send this info after payment:*\n"
+        f"• Your User ID: `"
+    )
+    tail = (
+        f"`\n"
+        f"• Package: {package_name}\n\n"
+        f"{PAYMENT_INSTRUCTIONS}\n"
+        f"Once payment is confirmed, you'll get instant access!"
+    )
+    keyboard = [[InlineKeyboardButton("💬 Message Admin", url=f"https://t.me/{ADMIN_USERNAME}")]]
+    if stripe_link:
+        keyboard.insert(0, [InlineKeyboardButton("💳 Pay Online Now", url=stripe_link)])
+    return head, tail, InlineKeyboardMarkup(keyboard)
+
+UPGRADE_OFFERS = {
+    'upgrade_basic': _upgrade_offer("Basic", "$4.99", STRIPE_BASIC_LINK),
+    'upgrade_pro': _upgrade_offer("Pro", "$9.99", STRIPE_PRO_LINK),
+    'upgrade_unlimited': _upgrade_offer("Unlimited", "$19.99", STRIPE_UNLIMITED_LINK),
+}
+UNKNOWN_UPGRADE_OFFER = _upgrade_offer("Unknown", "0", None)
+
+# ===== Button Press Dedup =====
+# A second tap on the same button of the same message within 5 s is acknowledged and ignored
+RECENT_PRESSES = TTLCache(maxsize=10_000, ttl=5)
+
+async def is_repeat_press(query) -> bool:
+    key = (query.from_user.id, query.message.message_id if query.message else None, query.data)
+    if key in RECENT_PRESSES:
+        await query.answer()
+        return True
+    RECENT_PRESSES[key] = True
+    return False
+
+# ===== Callback Patterns =====
+# Precompiled, fully anchored ASCII patterns passed to CallbackQueryHandler
+DIALECT_CALLBACK_RE = re.compile(r"\Adial_(" + "|".join(DIALECT_PROMPTS) + r")\Z", re.ASCII)
+SAVE_CALLBACK_RE = re.compile(r"\Asave_fav\Z", re.ASCII)
+REPORT_CALLBACK_RE = re.compile(r"\Areport_issue\Z", re.ASCII)
+UPGRADE_CALLBACK_RE = re.compile(r"\Aupgrade_(basic|pro|unlimited)\Z", re.ASCII)
+REVIEW_CALLBACK_RE = re.compile(r"\Arev_(?:(approve|reject)_(\d+)|skip)\Z", re.ASCII)
+HISTORY_PAGE_CALLBACK_RE = re.compile(r"\Ahist_pg_(\d+)\Z", re.ASCII)
+SAVED_PAGE_CALLBACK_RE = re.compile(r"\Afav_pg_(\d+)\Z", re.ASCII)
+
+# ===== Pagination =====
+HISTORY_PAGE_SIZE = 10
+SAVED_PAGE_SIZE = 5
+SAVED_ITEM_MAX_CHARS = 600
+
+def parse_page_arg(args) -> int:
+    """Turn an optional 1-based page argument (e.g. `/saved 2`) into a 0-based page index."""
+    if args and args[0].isdigit():
+        return max(int(args[0]) - 1, 0)
+    return 0
+
+def page_keyboard(prefix: str, page: int, has_next: bool):
+    """Prev/Next buttons for a paged list, or None when everything fits on one page."""
+    buttons = []
+    if page > 0:
+        buttons.append(InlineKeyboardButton("⬅️ Prev", callback_data=f"{prefix}{page - 1}"))
+    if has_next:
+        buttons.append(InlineKeyboardButton("Next ➡️", callback_data=f"{prefix}{page + 1}"))
+    return InlineKeyboardMarkup([buttons]) if buttons else None
+
+class PendingFeedback:
+    """Correction a user is about to submit, kept in context.user_data['feedback']."""
+    __slots__ = ('original', 'translation')
+
+    def __init__(self, original: str, translation: str):
+        self.original = original
+        self.translation = translation
+
 async def check_admin(update: Update) -> bool:
-    """Check if user is an admin."""
+    """Check if user is an admin (in-memory set, no DB round trip)."""
     if not update.effective_user:
         return False
-    user_id = update.effective_user.id
-    is_allowed, access_type = await db.is_user_allowed(user_id)
-    return access_type == "admin"
+    return db.is_admin(update.effective_user.id)
 
 async def handle_inline_query(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle inline queries."""
@@ -90,34 +248,38 @@ async def handle_inline_query(update: Update, context: ContextTypes.DEFAULT_TYPE
 
         await update.inline_query.answer(results, cache_time=0)
     except Exception as e:
-        logger.error(f"Inline query error: {e}")
+        logger.error("Inline query error: %s", e)
 
 
 async def packages_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show available packages for purchase."""
     packages = await db.get_all_packages()
     
-    text = "💎 *Available Packages*\n\n"
+    parts = ["💎 *Available Packages*\n\n"]
     keyboard = []
     
     for pkg in packages:
         if pkg['price'] == 0:
-            text += f"🆓 *{pkg['name']}* - Free\n"
-            text += f"   {pkg['limit']} translations/hour\n"
-            text += f"   {pkg['description']}\n\n"
+            parts.append(
+                f"🆓 *{pkg['name']}* - Free\n"
+                f"   {pkg['limit']} translations/hour\n"
+                f"   {pkg['description']}\n\n"
+            )
         else:
-            text += f"{'⭐' if pkg['price'] < 10 else '🚀' if pkg['price'] < 20 else '💎'} *{pkg['name']}* - ${pkg['price']:.2f}/mo\n"
-            text += f"   {pkg['limit']} translations/hour\n"
-            text += f"   {pkg['description']}\n"
-            text += f"   Duration: {pkg['duration']} days\n\n"
-            
-            if pkg['price'] > 0:
-                keyboard.append([InlineKeyboardButton(
-                    f"Upgrade to {pkg['name']} - ${pkg['price']:.2f}", 
-                    callback_data=f"upgrade_{pkg['name'].lower()}"
-                )])
+            icon = PACKAGE_ICONS[bisect.bisect_right(PACKAGE_PRICE_THRESHOLDS, pkg['price'])]
+            parts.append(
+                f"{icon} *{pkg['name']}* - ${pkg['price']:.2f}/mo\n"
+                f"   {pkg['limit']} translations/hour\n"
+                f"   {pkg['description']}\n"
+                f"   Duration: {pkg['duration']} days\n\n"
+            )
+            keyboard.append([InlineKeyboardButton(
+                f"Upgrade to {pkg['name']} - ${pkg['price']:.2f}", 
+                callback_data=f"upgrade_{pkg['name'].lower()}"
+            )])
     
-    text += "\n✨ Upgrade to get more translations!"
+    parts.append("\n✨ Upgrade to get more translations!")
+    text = "".join(parts)
     
     await update.message.reply_text(
         text,
@@ -128,20 +290,23 @@ async def packages_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def subscription_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show user's current subscription status."""
     user_id = update.effective_user.id
-    limits = await db.get_user_limits(user_id)
-    sub = await db.get_user_subscription(user_id)
+    limits, sub = await asyncio.gather(db.get_user_limits(user_id), db.get_user_subscription(user_id))
     
-    text = f"👤 *Your Subscription*\n\n"
-    text += f"Current Tier: *{limits['tier']}*\n"
-    text += f"Translations: *{limits['limit']}* per hour\n"
+    parts = [
+        f"👤 *Your Subscription*\n\n"
+        f"Current Tier: *{limits['tier']}*\n"
+        f"Translations: *{limits['limit']}* per hour\n"
+    ]
     
     if sub:
-        text += f"\n📊 Usage: {sub['used']} translations used\n"
+        parts.append(f"\n📊 Usage: {sub['used']} translations used\n")
         if sub['expires']:
-            text += f"⏰ Expires: {sub['expires']}\n"
+            parts.append(f"⏰ Expires: {sub['expires']}\n")
     
     if limits['tier'] == 'free':
-        text += "\n💡 Type `/packages` to upgrade and get more translations!"
+        parts.append("\n💡 Type `/packages` to upgrade and get more translations!")
+    
+    text = "".join(parts)
     
     await update.message.reply_text(text, parse_mode='Markdown')
 
@@ -226,14 +391,11 @@ async def whitelist_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             else:
                 await update.message.reply_text("❌ Failed to add user.")
         elif action == 'remove':
-            success = await db.add_admin(target_user_id, username=None, can_grant_access=False) # Wait, logic in app.py was slightly different or reused add_admin? 
-            # In app.py: elif action == 'remove': success = await db.remove_admin(target_user_id)
-            # But wait, db.remove_admin wasn't in the Database class I copied?
-            # Let me check Database class again.
-            # I don't recall seeing remove_admin. I saw add_admin.
-            # Let's fix this inline. If remove_admin missing, I should add it to DB or handle here.
-            # I'll check DB class in a moment. For now assume it exists or use SQL.
-            pass
+            success = await db.remove_admin(target_user_id)
+            if success:
+                await update.message.reply_text(f"✅ User `{target_user_id}` removed from whitelist!", parse_mode='Markdown')
+            else:
+                await update.message.reply_text("❌ User not found in whitelist.")
         else:
             await update.message.reply_text("❌ Invalid action. Use 'add' or 'remove'.")
     except ValueError:
@@ -248,35 +410,32 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     if not is_allowed:
         # Whitelist mode is active and user is not allowed
-        admin_username = ADMIN_CONTACT.lstrip('@')
-        keyboard = [[InlineKeyboardButton("💬 Contact Admin for Access", url=f"https://t.me/{admin_username}")]]
         await update.message.reply_text(
             "🔒 *Welcome to Darja Bot!*\n\n"
             "This bot is currently in private beta.\n"
             "Access is by invitation only.\n\n"
             f"Contact {ADMIN_CONTACT} to request access.",
             parse_mode='Markdown',
-            reply_markup=InlineKeyboardMarkup(keyboard)
+            reply_markup=CONTACT_ADMIN_KEYBOARD
         )
         return
     
     # Get user limits to show their tier
     limits = await db.get_user_limits(user_id)
     
-    welcome_text = (
-        f"🇩🇿 *Marhba!* I am your Darja assistant.\n\n"
-        f"You're using the *{limits['tier']}* tier.\n"
-    )
-    
     if limits['tier'] == 'free':
-        welcome_text += f"You have {limits['limit']} translations per hour.\n\n"
-        welcome_text += "💡 Type `/packages` to see upgrade options!\n\n"
+        tier_text = f"You have {limits['limit']} translations per hour.\n\n💡 Type `/packages` to see upgrade options!\n\n"
     elif limits['tier'] == 'admin':
-        welcome_text += "You have unlimited access as an administrator.\n\n"
+        tier_text = "You have unlimited access as an administrator.\n\n"
     else:
-        welcome_text += f"You have {limits['limit']} translations per hour.\n\n"
+        tier_text = f"You have {limits['limit']} translations per hour.\n\n"
     
-    welcome_text += "Send any text to begin or use /help to see my commands."
+    welcome_text = (
+        f"🇩🇿 *Marhba!* I am your Darja assistant.\n\n"
+        f"You're using the *{limits['tier']}* tier.\n"
+        f"{tier_text}"
+        "Send any text to begin or use /help to see my commands."
+    )
     
     await update.message.reply_text(welcome_text, parse_mode='Markdown')
 
@@ -285,34 +444,30 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
     limits = await db.get_user_limits(user_id)
     
-    help_text = (
-        "📖 *How to use this bot:*\n"
-        "• Send **English/French** text to get the Darja translation.\n"
-        "• Send **Arabic script** to get French and English translations.\n\n"
-        "✨ *Available Commands:*\n"
-        "/subscription - View your subscription status\n"
-        "/packages - View upgrade packages & pricing\n"
-        "/dialect - Change region (Algiers, Oran, etc.)\n"
-        "/history - See your last 10 translations\n"
-        "/saved - View your bookmarked items\n"
-        "/save - Reply to any translation with this to bookmark it\n"
-        "/stats - View cache statistics (admin)\n"
-        "/queue - View queue status (admin)\n"
-        "/dictionary - View offline dictionary words\n"
-        "/start - Restart the bot\n\n"
-        f"⚠️ *Your Rate Limit:* {limits['limit']} translations per hour ({limits['tier']} tier)\n"
-        "⏱️ *Queue:* Translations are processed asynchronously\n"
-        "📚 *Offline:* Dictionary available when API fails"
-    )
+    help_text = HELP_TEMPLATE.format(limit=limits['limit'], tier=limits['tier'])
     await update.message.reply_text(help_text, parse_mode='Markdown')
 
-async def history_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    history = await db.get_history(update.effective_user.id)
+async def render_history_page(user_id: int, page: int):
+    """Return (text, keyboard) for one page of a user's history."""
+    history = await db.get_history(user_id, limit=HISTORY_PAGE_SIZE + 1, offset=page * HISTORY_PAGE_SIZE)
     if not history:
-        return await update.message.reply_text("📚 Your history is currently empty.")
+        return "📚 Your history is currently empty.", None
     
-    lines = [f"• `{h['text']}` ({h['time']})" for h in history]
-    await update.message.reply_text("📚 *Recent Translations:*\n\n" + "\n".join(lines), parse_mode='Markdown')
+    has_next = len(history) > HISTORY_PAGE_SIZE
+    lines = [f"• `{text}` ({time})" for text, time in history[:HISTORY_PAGE_SIZE]]
+    text = f"📚 *Recent Translations* (page {page + 1}):\n\n" + "\n".join(lines)
+    return text, page_keyboard('hist_pg_', page, has_next)
+
+async def history_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    text, keyboard = await render_history_page(update.effective_user.id, parse_page_arg(context.args))
+    await update.message.reply_text(text, parse_mode='Markdown', reply_markup=keyboard)
+
+async def history_page_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Swap the /history message to another page in place."""
+    query = update.callback_query
+    await query.answer()
+    text, keyboard = await render_history_page(update.effective_user.id, int(context.matches[0].group(1)))
+    await query.edit_message_text(text, parse_mode='Markdown', reply_markup=keyboard)
 
 async def save_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not update.message.reply_to_message:
@@ -327,12 +482,28 @@ async def save_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     else:
         await update.message.reply_text("✅ Already in your /saved list.")
 
-async def saved_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    favs = await db.get_favorites(update.effective_user.id)
+async def render_saved_page(user_id: int, page: int):
+    """Return (text, keyboard) for one page of a user's saved translations."""
+    favs = await db.get_favorites(user_id, limit=SAVED_PAGE_SIZE + 1, offset=page * SAVED_PAGE_SIZE)
     if not favs:
-        return await update.message.reply_text("⭐ Your saved list is empty.")
+        return "⭐ Your saved list is empty.", None
     
-    await update.message.reply_text("⭐ *Your Saved Translations:*\n\n" + "\n---\n".join(favs), parse_mode='Markdown')
+    has_next = len(favs) > SAVED_PAGE_SIZE
+    # Clip long entries so a full page always fits in one Telegram message
+    items = [f if len(f) <= SAVED_ITEM_MAX_CHARS else f[:SAVED_ITEM_MAX_CHARS] + "…" for f in favs[:SAVED_PAGE_SIZE]]
+    text = f"⭐ *Your Saved Translations* (page {page + 1}):\n\n" + "\n---\n".join(items)
+    return text, page_keyboard('fav_pg_', page, has_next)
+
+async def saved_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    text, keyboard = await render_saved_page(update.effective_user.id, parse_page_arg(context.args))
+    await update.message.reply_text(text, parse_mode='Markdown', reply_markup=keyboard)
+
+async def saved_page_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Swap the /saved message to another page in place."""
+    query = update.callback_query
+    await query.answer()
+    text, keyboard = await render_saved_page(update.effective_user.id, int(context.matches[0].group(1)))
+    await query.edit_message_text(text, parse_mode='Markdown', reply_markup=keyboard)
 
 async def dictionary_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show available offline dictionary words."""
@@ -370,29 +541,30 @@ async def queue_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         f"{status_icon} Status: `{'Running' if stats['is_running'] else 'Stopped'}`\n"
         f"⏳ In queue: `{stats['in_queue']}`\n"
         f"✅ Processed: `{stats['processed']}`\n"
-        f"❌ Failed: `{stats['failed']}`\n\n"
+        f"❌ Failed: `{stats['failed']}`\n"
+        f"🚫 Rejected (queue full): `{stats['rejected']}`\n"
+        f"⌛ Dropped (stale): `{stats['dropped']}`\n"
+        f"🔤 Words translated: `{stats['words']}`\n\n"
         f"The queue processes translations asynchronously to keep the bot responsive."
     )
     await update.message.reply_text(stats_text, parse_mode='Markdown')
 
 async def set_dialect(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    keyboard = [
-        [InlineKeyboardButton("Standard 🇩🇿", callback_data='dial_standard')],
-        [InlineKeyboardButton("Algiers 🏙️", callback_data='dial_algiers')],
-        [InlineKeyboardButton("Oran 🌅", callback_data='dial_oran')],
-        [InlineKeyboardButton("Constantine 🌉", callback_data='dial_constantine')]
-    ]
-    await update.message.reply_text("Select your preferred dialect:", reply_markup=InlineKeyboardMarkup(keyboard))
+    await update.message.reply_text("Select your preferred dialect:", reply_markup=DIALECT_KEYBOARD)
 
 async def dialect_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
-    dialect_key = query.data.replace('dial_', '')
+    if await is_repeat_press(query):
+        return
+    dialect_key = context.matches[0].group(1)
     await db.update_user_dialect(update.effective_user.id, dialect_key)
     await query.answer(f"Dialect set to {dialect_key.title()}")
     await query.edit_message_text(f"✅ Dialect successfully updated to: **{DIALECT_PROMPTS[dialect_key]}**", parse_mode='Markdown')
 
 async def save_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
+    if await is_repeat_press(query):
+        return
     translation = query.message.text
     added = await db.add_favorite(update.effective_user.id, translation)
     if added:
@@ -405,7 +577,7 @@ async def handle_voice(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not update.message:
         return
         
-    logger.info(f"Audio/Voice/Photo message received from {update.effective_user.id}")
+    logger.info("Audio/Voice/Photo message received from %s", update.effective_user.id)
         
     # Check if it's a voice note, an audio file, a video note, or a photo
     voice = update.message.voice
@@ -418,107 +590,136 @@ async def handle_voice(update: Update, context: ContextTypes.DEFAULT_TYPE):
         
     user_id = update.effective_user.id
     
-    # Permission check
-    is_allowed, access_type = await db.is_user_allowed(user_id)
-    if not is_allowed:
-        admin_username = ADMIN_CONTACT.lstrip('@')
-        keyboard = [[InlineKeyboardButton("💬 Contact Admin for Access", url=f"https://t.me/{admin_username}")]]
+    # Permission check, tier limits and rate limit in one call
+    request = await db.begin_request(user_id)
+    if not request['allowed']:
         await update.message.reply_text(
-            "🔒 *Access Restricted*\n\n"
-            "This bot is currently in private beta and requires an invitation to use.\n\n"
-            f"If you'd like to request access, please contact: {ADMIN_CONTACT}",
+            ACCESS_RESTRICTED_TEXT,
             parse_mode='Markdown',
-            reply_markup=InlineKeyboardMarkup(keyboard)
+            reply_markup=CONTACT_ADMIN_KEYBOARD
         )
         return
 
-    # Rate limit check
-    limits = await db.get_user_limits(user_id)
-    allowed, remaining, reset_minutes = await db.check_rate_limit(user_id, max_requests=limits['limit'], window_minutes=limits['window'])
-    
-    if not allowed:
-        await update.message.reply_text(f"⏱️ *Rate limit reached!*\n\nPlease try again in {reset_minutes} minute(s).", parse_mode='Markdown')
+    if not request['within_limit']:
+        await update.message.reply_text(f"⏱️ *Rate limit reached!*\n\nPlease try again in {request['reset_minutes']} minute(s).", parse_mode='Markdown')
         return
 
-    # Handle Photo (Image Translation)
+    # Ack with a placeholder, then hand the download/convert/translate work to a background
+    # task so this update is finished as soon as the status message is out
     if photo:
-        await update.message.chat.send_action(action=constants.ChatAction.UPLOAD_PHOTO)
-        status_msg = await update.message.reply_text("🖼️ *Analyzing image...*", parse_mode='Markdown')
-        
-        try:
-            # Get largest photo
-            file_id = photo[-1].file_id
-            photo_file = await context.bot.get_file(file_id)
-            
-            with tempfile.TemporaryDirectory() as tmp_dir:
-                input_path = os.path.join(tmp_dir, "image.jpg")
-                await photo_file.download_to_drive(input_path)
-                
-                translation = await translate_image(input_path, user_id)
-                
-                chunks = split_message(translation)
-                await status_msg.edit_text(chunks[0], parse_mode='Markdown')
-                for chunk in chunks[1:]:
-                    await update.message.reply_text(chunk, parse_mode='Markdown')
-            return
-        except Exception as e:
-            logger.error(f"Image processing error: {e}")
-            await status_msg.edit_text(f"❌ Error analyzing image: {str(e)}")
-            return
+        # Resolve the largest photo while the placeholder is being sent
+        get_file_task, status_msg = await reply_while_resolving(update, context, photo[-1].file_id, "🖼️ *Analyzing image...*")
+        context.application.create_task(process_photo(update, get_file_task, status_msg, user_id), update=update)
+        return
 
-    # Handle Audio/Voice (Voice Translation)
-    await update.message.chat.send_action(action=constants.ChatAction.RECORD_VOICE)
-    status_msg = await update.message.reply_text("📥 *Processing audio message...*", parse_mode='Markdown')
+    # Get the file ID
+    if voice:
+        file_id = voice.file_id
+    elif audio:
+        file_id = audio.file_id
+    else: # video_note
+        file_id = video_note.file_id
+    
+    # Resolve the file while the placeholder is being sent
+    get_file_task, status_msg = await reply_while_resolving(update, context, file_id, "📥 *Processing audio message...*")
+    context.application.create_task(
+        process_audio(update, get_file_task, status_msg, user_id, is_voice_note=bool(voice)), update=update
+    )
 
+async def reply_while_resolving(update: Update, context: ContextTypes.DEFAULT_TYPE, file_id: str, status_text: str):
+    """Send the status placeholder while get_file runs; returns (get_file task, status message).
+    
+    If the reply fails, the lookup is cancelled (and its outcome consumed) before the error propagates.
+    """
+    get_file_task = asyncio.create_task(context.bot.get_file(file_id))
     try:
-        # Get the file ID
-        if voice:
-            file_id = voice.file_id
-        elif audio:
-            file_id = audio.file_id
-        else: # video_note
-            file_id = video_note.file_id
-            
-        voice_file = await context.bot.get_file(file_id)
+        status_msg = await update.message.reply_text(status_text, parse_mode='Markdown')
+    except BaseException:
+        get_file_task.cancel()
+        get_file_task.add_done_callback(lambda task: task.cancelled() or task.exception())
+        raise
+    return get_file_task, status_msg
+
+async def process_photo(update: Update, get_file_task, status_msg, user_id: int):
+    """Background part of image translation: download, translate, deliver."""
+    try:
+        photo_file = await get_file_task
         
-        with tempfile.TemporaryDirectory() as tmp_dir:
-            input_path = os.path.join(tmp_dir, "input_file")
-            wav_path = os.path.join(tmp_dir, "voice.wav")
+        with tempfile.TemporaryDirectory(dir=TMP_DIR) as tmp_dir:
+            input_path = os.path.join(tmp_dir, "image.jpg")
+            await photo_file.download_to_drive(input_path)
             
-            await voice_file.download_to_drive(input_path)
+            translation = await translate_image(input_path, user_id)
             
-            # Check if ffmpeg is installed
+            chunks = iter_split_message(translation)
+            await status_msg.edit_text(next(chunks, "❌ Empty response"), parse_mode='Markdown')
+            for chunk in chunks:
+                await update.message.reply_text(chunk, parse_mode='Markdown')
+    except Exception as e:
+        logger.error("Image processing error: %s", e)
+        await status_msg.edit_text(f"❌ Error analyzing image: {str(e)}")
+
+async def process_audio(update: Update, get_file_task, status_msg, user_id: int, is_voice_note: bool):
+    """Background part of voice translation: download, convert if needed, translate, deliver."""
+    try:
+        voice_file = await get_file_task
+        
+        # The converted audio is handed to translate_voice as bytes; no output file is written
+        if is_voice_note:
+            # Voice notes are always OGG/Opus, which Gemini and Whisper accept as-is
+            mime_type = "audio/ogg"
+            audio_bytes = bytes(await voice_file.download_as_bytearray())
+        elif av is not None:
+            # Decode and resample in-process: no ffmpeg fork
+            mime_type = "audio/wav"
+            data = await voice_file.download_as_bytearray()
             try:
-                subprocess.run(['ffmpeg', '-version'], capture_output=True, check=True)
-            except (subprocess.CalledProcessError, FileNotFoundError):
-                logger.error("FFmpeg is not installed on this system.")
-                await status_msg.edit_text("❌ Audio processing is currently unavailable (FFmpeg missing).")
+                audio_bytes = await asyncio.to_thread(transcode_to_wav, bytes(data))
+            except Exception as e:
+                logger.error("Audio decode error: %s", e)
+                await status_msg.edit_text("❌ Error processing audio file.")
                 return
-
-            # Convert any audio/video format to WAV
-            process = subprocess.run(
-                ['ffmpeg', '-y', '-i', input_path, '-ar', '16000', '-ac', '1', wav_path],
-                capture_output=True, text=True
-            )
+        elif not FFMPEG_AVAILABLE:
+            await status_msg.edit_text("❌ Audio processing is currently unavailable (FFmpeg missing).")
+            return
+        else:
+            mime_type = "audio/mpeg"
+            
+            # Convert arbitrary audio/video formats to compact mono MP3 in a single
+            # non-blocking ffmpeg run. The input stays a file because MP4/M4A need
+            # seeking (TMP_DIR is tmpfs when available); the output comes back on stdout.
+            with tempfile.TemporaryDirectory(dir=TMP_DIR) as tmp_dir:
+                input_path = os.path.join(tmp_dir, "input_file")
+                await voice_file.download_to_drive(input_path)
+                process = await asyncio.create_subprocess_exec(
+                    'ffmpeg', '-loglevel', 'error', '-i', input_path,
+                    '-vn', '-ar', '16000', '-ac', '1', '-f', 'mp3', 'pipe:1',
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE
+                )
+                audio_bytes, stderr = await process.communicate()
 
             if process.returncode != 0:
-                logger.error(f"FFmpeg error: {process.stderr}")
+                logger.error("FFmpeg error: %s", stderr.decode(errors='replace'))
                 await status_msg.edit_text("❌ Error processing audio file.")
                 return
 
-            await status_msg.edit_text("🔄 *Translating audio...*", parse_mode='Markdown')
-            
-            # Translate using Gemini
-            translation = await translate_voice(wav_path, user_id)
+        # Progress edit runs alongside the translation; it is awaited (errors ignored)
+        # before the result edit so it can never land on top of the result
+        progress_edit = asyncio.create_task(status_msg.edit_text("🔄 *Translating audio...*", parse_mode='Markdown'))
+        
+        # Translate using Gemini
+        translation = await translate_voice(audio_bytes, user_id, mime_type=mime_type)
+        await asyncio.gather(progress_edit, return_exceptions=True)
+        
+        # Update status message with result
+        chunks = iter_split_message(translation)
+        await status_msg.edit_text(next(chunks, "❌ Empty response"), parse_mode='Markdown')
+        for chunk in chunks:
+            await update.message.reply_text(chunk, parse_mode='Markdown')
             
-            # Update status message with result
-            chunks = split_message(translation)
-            await status_msg.edit_text(chunks[0], parse_mode='Markdown')
-            for chunk in chunks[1:]:
-                await update.message.reply_text(chunk, parse_mode='Markdown')
-                
     except Exception as e:
-        logger.error(f"Voice processing error: {e}")
+        logger.error("Voice processing error: %s", e)
         await status_msg.edit_text(f"❌ An error occurred during audio processing: {str(e)}")
 
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -526,45 +727,38 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     
     # Check for feedback state
-    if context.user_data.get('feedback_state') == 'waiting_for_correction':
+    if 'feedback' in context.user_data:
         await handle_feedback(update, context)
         return
     
+    # Nothing to translate: answer before touching the DB or quota
+    if not update.message.text.strip():
+        await update.message.reply_text("✏️ Send me a word or phrase to translate.")
+        return
+    arabic_words, other_words = count_words(update.message.text)
+    
     user_id = update.effective_user.id
     
-    # Check if user is allowed (whitelist check)
-    is_allowed, access_type = await db.is_user_allowed(user_id)
+    # Whitelist check, subscription tier/limits and the tier's rate limit in one call
+    request = await db.begin_request(user_id)
     
-    if not is_allowed:
+    if not request['allowed']:
         # User is not in whitelist
-        admin_username = ADMIN_CONTACT.lstrip('@')
-        keyboard = [[InlineKeyboardButton("💬 Contact Admin for Access", url=f"https://t.me/{admin_username}")]]
         await update.message.reply_text(
-            "🔒 *Access Restricted*\n\n"
-            "This bot is currently in private beta and requires an invitation to use.\n\n"
-            f"If you'd like to request access, please contact: {ADMIN_CONTACT}",
+            ACCESS_RESTRICTED_TEXT,
             parse_mode='Markdown',
-            reply_markup=InlineKeyboardMarkup(keyboard)
+            reply_markup=CONTACT_ADMIN_KEYBOARD
         )
         return
     
-    # Get user's subscription tier and limits
-    limits = await db.get_user_limits(user_id)
-    max_requests = limits['limit']
-    window_minutes = limits['window']
-    tier = limits['tier']
+    max_requests = request['limit']
+    tier = request['tier']
+    remaining = request['remaining']
+    reset_minutes = request['reset_minutes']
     
-    # Check rate limit based on user's tier
-    allowed, remaining, reset_minutes = await db.check_rate_limit(user_id, max_requests=max_requests, window_minutes=window_minutes)
-    
-    if not allowed:
+    if not request['within_limit']:
         # Show upgrade options for free users who hit limits
         if tier == 'free':
-            keyboard = [
-                [InlineKeyboardButton("⭐ Upgrade to Basic - $4.99/mo", callback_data='upgrade_basic')],
-                [InlineKeyboardButton("🚀 Upgrade to Pro - $9.99/mo", callback_data='upgrade_pro')],
-                [InlineKeyboardButton("💎 Go Unlimited - $19.99/mo", callback_data='upgrade_unlimited')]
-            ]
             await update.message.reply_text(
                 f"⏱️ *Rate Limit Reached!*\n\n"
                 f"You've used all {max_requests} translations in your free tier.\n\n"
@@ -574,7 +768,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 f"• Unlimited: No limits!\n\n"
                 f"Or wait {reset_minutes} minute(s) for your limit to reset.",
                 parse_mode='Markdown',
-                reply_markup=InlineKeyboardMarkup(keyboard)
+                reply_markup=UPGRADE_KEYBOARD
             )
         else:
             # Paid user hit their limit (rare but possible)
@@ -587,8 +781,6 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
         return
     
-    await update.message.chat.send_action(action=constants.ChatAction.TYPING)
-    
     # Show queue position if there are pending translations
     queue_size = translation_queue.get_stats()['in_queue']
     queue_notice = ""
@@ -606,12 +798,16 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
     
     # Add translation to queue for async processing
-    await translation_queue.add_translation(
+    queued = await translation_queue.add_translation(
         text=update.message.text,
         user_id=user_id,
         chat_id=update.message.chat_id,
-        message_id=status_msg.message_id
+        message_id=status_msg.message_id,
+        words=arabic_words + other_words
     )
+    if not queued:
+        await status_msg.edit_text("⚠️ The bot is busy right now. Please try again in a minute.")
+        return
     
     # Rate limit warning (only for free tier or low remaining)
     if remaining <= 3 and tier == 'free':
@@ -624,52 +820,17 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def upgrade_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle upgrade button clicks."""
     query = update.callback_query
+    if await is_repeat_press(query):
+        return
     await query.answer()
     
     user_id = update.effective_user.id
     
-    # Get package details
-    package_name = "Unknown"
-    package_price = "0"
-    stripe_link = None
-    
-    if query.data == 'upgrade_basic':
-        package_name = "Basic"
-        package_price = "$4.99"
-        stripe_link = STRIPE_BASIC_LINK
-    elif query.data == 'upgrade_pro':
-        package_name = "Pro"
-        package_price = "$9.99"
-        stripe_link = STRIPE_PRO_LINK
-    elif query.data == 'upgrade_unlimited':
-        package_name = "Unlimited"
-        package_price = "$19.99"
-        stripe_link = STRIPE_UNLIMITED_LINK
-    
-    pay_now_btn = ""
-    if stripe_link:
-        pay_now_btn = f"🔗 *Pay Now:* [Click Here to Pay]({stripe_link})\n\n"
-    
-    message_text = (
-        f"💎 *Upgrade to {package_name}*\n\n"
-        f"Price: *{package_price}*\n\n"
-        f"{pay_now_btn}"
-        f"To upgrade via other methods, message: {ADMIN_CONTACT}\n\n"
-        f"📋 *Send this info after payment:*\n"
-        f"• Your User ID: `{user_id}`\n"
-        f"• Package: {package_name}\n\n"
-        f"{PAYMENT_INSTRUCTIONS}\n"
-        f"Once payment is confirmed, you'll get instant access!"
-    )
-    
-    keyboard = [[InlineKeyboardButton("💬 Message Admin", url=f"https://t.me/{ADMIN_CONTACT.lstrip('@')}")]]
-    if stripe_link:
-        keyboard.insert(0, [InlineKeyboardButton("💳 Pay Online Now", url=stripe_link)])
-    
+    head, tail, keyboard = UPGRADE_OFFERS.get(query.data, UNKNOWN_UPGRADE_OFFER)
     await query.edit_message_text(
-        message_text,
+        f"{head}{user_id}{tail}",
         parse_mode='Markdown',
-        reply_markup=InlineKeyboardMarkup(keyboard)
+        reply_markup=keyboard
     )
 
 async def report_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -683,34 +844,23 @@ async def report_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Clean emojis for easier parsing
     clean_text = message_text.replace('*', '')
     
-    # Try to extract original text using regex if formatted
-    # Expected format: "🔤 Original: [text]"
-    # Note: Using simple string finding as regex might be fragile with newlines
-    
+    # Expected format: "🔤 Original: [text]\n🇩🇿 Darja: [text]\n🗣️ Pronunciation: ..."
+    # str.partition scans once per label and never allocates a list
     original_text = "Unknown"
     generated_translation = message_text
     
-    try:
-        if "Original:" in clean_text:
-            parts = clean_text.split("Original:")
-            if len(parts) > 1:
-                # Take everything until the next section (Darja:)
-                original_part = parts[1].split("Darja:")[0]
-                original_text = original_part.strip()
-        
-        if "Darja:" in clean_text:
-             parts = clean_text.split("Darja:")
-             if len(parts) > 1:
-                 # Take everything until the next section
-                 trans_part = parts[1].split("Pronunciation:")[0]
-                 generated_translation = trans_part.strip()
-    except Exception as e:
-        logging.error(f"Error parsing message for feedback: {e}")
+    _, found, rest = clean_text.partition("Original:")
+    if found:
+        # Take everything until the next section (Darja:)
+        original_text = rest.partition("Darja:")[0].strip()
+    
+    _, found, rest = clean_text.partition("Darja:")
+    if found:
+        # Take everything until the next section
+        generated_translation = rest.partition("Pronunciation:")[0].strip()
 
     # Set state
-    context.user_data['feedback_state'] = 'waiting_for_correction'
-    context.user_data['feedback_original'] = original_text
-    context.user_data['feedback_translation'] = generated_translation
+    context.user_data['feedback'] = PendingFeedback(original_text, generated_translation)
     
     await query.message.reply_text(
         f"📝 **Help Improve Our Translations**\n\n"
@@ -722,10 +872,7 @@ async def report_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def cancel_feedback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Cancel feedback state."""
-    if context.user_data.get('feedback_state') == 'waiting_for_correction':
-        del context.user_data['feedback_state']
-        context.user_data.pop('feedback_original', None)
-        context.user_data.pop('feedback_translation', None)
+    if context.user_data.pop('feedback', None):
         await update.message.reply_text("❌ Feedback cancelled.")
     else:
         await update.message.reply_text("You are not submitting feedback.")
@@ -734,8 +881,8 @@ async def handle_feedback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
     feedback_text = update.message.text
     
-    original_text = context.user_data.get('feedback_original', 'Unknown')
-    generated_translation = context.user_data.get('feedback_translation', 'Unknown')
+    # Clear state
+    pending = context.user_data.pop('feedback')
     
     # Get user dialect context
     user = await db.get_user(user_id)
@@ -744,19 +891,12 @@ async def handle_feedback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Save feedback to DB
     success = await db.add_feedback(
         user_id=user_id,
-        original_text=original_text,
-        generated_translation=generated_translation,
+        original_text=pending.original,
+        generated_translation=pending.translation,
         suggested_translation=feedback_text,
         dialect=dialect
     )
     
-    # Clear state
-    if 'feedback_state' in context.user_data:
-        del context.user_data['feedback_state']
-        # Clean up other keys
-        context.user_data.pop('feedback_original', None)
-        context.user_data.pop('feedback_translation', None)
-    
     if success:
         await update.message.reply_text("✅ **Thank you!** Your feedback has been submitted for review.", parse_mode='Markdown')
     else:
@@ -800,7 +940,7 @@ async def broadcast_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await asyncio.sleep(0.05) 
         except Exception as e:
             failed += 1
-            logger.warning(f"Failed to broadcast to {uid}: {e}")
+            logger.warning("Failed to broadcast to %s: %s", uid, e)
             
         # Update status every 100 users
         if (sent + failed) % 100 == 0:
@@ -824,8 +964,7 @@ async def review_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     # Get one pending feedback item
-    cursor = await db.execute("SELECT id, original_text, generated_translation, suggested_translation, dialect FROM feedback WHERE status = 'pending' ORDER BY created_at ASC LIMIT 1")
-    row = await cursor.fetchone()
+    row = await db.get_next_pending_feedback()
     
     # Determine reply function
     if update.message:
@@ -861,35 +1000,30 @@ async def review_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def review_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle review actions."""
     query = update.callback_query
-    action = query.data
+    if await is_repeat_press(query):
+        return
+    # Format: rev_approve_123, rev_reject_123 or rev_skip (decision is None)
+    decision, fid = context.matches[0].groups()
     
-    if action == "rev_skip":
+    if decision is None:
         await query.message.delete()
         await review_command(update, context) 
         return
 
     try:
-        parts = action.split('_')
-        # Format: rev_approve_123 or rev_reject_123
-        decision = parts[1]
-        fid = int(parts[2])
+        fid = int(fid)
         
         if decision == "approve":
-            cursor = await db.execute("SELECT original_text, suggested_translation, dialect FROM feedback WHERE id = ?", (fid,))
-            row = await cursor.fetchone()
-            if row:
-                orig, sugg, dial = row
-                await db.add_verified_translation(orig, sugg, dial, approved_by=update.effective_user.id)
-                # Update status
-                await db.execute("UPDATE feedback SET status = 'approved' WHERE id = ?", (fid,))
-                await db.commit()
+            approved = await db.approve_feedback(fid, approved_by=update.effective_user.id)
+            if approved:
                 await query.answer("✅ Approved & Verified!")
+            elif approved is None:
+                await query.answer("❌ Feedback not found")
             else:
-                 await query.answer("❌ Feedback not found")
+                await query.answer("Error processing request")
         
         elif decision == "reject":
-            await db.execute("UPDATE feedback SET status = 'rejected' WHERE id = ?", (fid,))
-            await db.commit()
+            await db.reject_feedback(fid)
             await query.answer("❌ Rejected")
             
         await query.message.delete()
@@ -1,83 +1,134 @@
 import os
 import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
 import asyncio
+import hashlib
+import pickle
+import signal
+import time
+import orjson
 from datetime import datetime
-from flask import Flask, request
+from quart import Quart, request
 import uvicorn
-from asgiref.wsgi import WsgiToAsgi
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
 from telegram import BotCommand, Update
 from telegram.ext import (
-    Application, CommandHandler, MessageHandler, CallbackQueryHandler, filters
+    Application, CommandHandler, MessageHandler, CallbackQueryHandler, InlineQueryHandler, filters,
+    BasePersistence, PersistenceInput
 )
 
-from config import TELEGRAM_TOKEN, BASE_URL, PORT, ADMIN_CONTACT, DATABASE_PATH, GEMINI_API_KEYS, GROQ_API_KEY
+from config import ENV, TELEGRAM_TOKEN, BASE_URL, PORT, UPDATE_QUEUE_SIZE, MAX_CONCURRENT_UPDATES, ADMIN_CONTACT, DATABASE_PATH, CACHE_STATS_REFRESH_INTERVAL, GEMINI_API_KEYS, GROQ_API_KEY
 from database import db
-from services import translation_queue
+from services import translation_queue, close_api_clients
 from handlers import (
     start, help_command, history_command, save_command, saved_command,
     dictionary_command, stats_command, queue_command, set_dialect,
     dialect_callback, save_callback, handle_voice, handle_message,
     packages_command, subscription_command, grant_command, revoke_command, whitelist_command,
     upgrade_callback, report_callback, review_command, review_callback, cancel_feedback,
-    handle_inline_query, broadcast_command
-)
-from telegram.ext import (
-    Application, CommandHandler, MessageHandler, CallbackQueryHandler, filters, InlineQueryHandler
+    handle_inline_query, broadcast_command,
+    history_page_callback, saved_page_callback,
+    DIALECT_CALLBACK_RE, SAVE_CALLBACK_RE, REPORT_CALLBACK_RE, UPGRADE_CALLBACK_RE, REVIEW_CALLBACK_RE,
+    HISTORY_PAGE_CALLBACK_RE, SAVED_PAGE_CALLBACK_RE
 )
 
 # Logging setup
+# Production keeps only warnings and errors; per-message INFO logs are for development.
+# Records are only enqueued on the event loop; a listener thread does the actual writes.
+log_queue = queue.SimpleQueue()
+log_stream_handler = logging.StreamHandler()
+log_stream_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+log_listener = QueueListener(log_queue, log_stream_handler, respect_handler_level=True)
 logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO,
-    handlers=[logging.StreamHandler()]
+    level=logging.WARNING if ENV == "prod" else logging.INFO,
+    handlers=[QueueHandler(log_queue)]
 )
+log_listener.start()
 logger = logging.getLogger(__name__)
 logging.getLogger("httpx").setLevel(logging.WARNING)
 
-# Track startup time
-startup_time = datetime.now()
+# Track startup time (monotonic: immune to wall-clock jumps, no datetime arithmetic per scrape)
+startup_monotonic = time.monotonic()
 
-# Flask App for Health Checks & Webhook
-flask_app = Flask(__name__)
+def uptime_seconds():
+    return time.monotonic() - startup_monotonic
 
-@flask_app.route('/webhook', methods=['POST'])
-async def webhook():
-    try:
-        # We need access to ptb_app here. We can set it globally or attach to flask app context
-        # Ideally, we put this inside main or use a global. 
-        # For simplicity in this structure, we'll assume ptb_app is available via closure or global
-        # But wait, uvicorn runs asgi_app.
-        # We can pass update to queue if we have access to ptb_app
-        payload = request.get_json(force=True)
-        update = Update.de_json(payload, ptb_app.bot)
-        await ptb_app.update_queue.put(update)
-        return "OK", 200
-    except Exception as e:
-        logger.error(f"Webhook Error: {e}")
-        return "OK", 200
+def format_uptime(seconds):
+    """H:MM:SS with a leading day count, like str(timedelta) without the fraction."""
+    days, rem = divmod(int(seconds), 86400)
+    hours, rem = divmod(rem, 3600)
+    minutes, secs = divmod(rem, 60)
+    clock = f"{hours}:{minutes:02}:{secs:02}"
+    return f"{days} day{'s' if days != 1 else ''}, {clock}" if days else clock
+
+# ISO timestamp for /health, rebuilt at most once per second
+_iso_timestamp = {'second': None, 'text': ''}
+
+def iso_timestamp():
+    second = int(time.time())
+    if second != _iso_timestamp['second']:
+        _iso_timestamp['second'] = second
+        _iso_timestamp['text'] = datetime.fromtimestamp(second).isoformat()
+    return _iso_timestamp['text']
+
+# Cache stats for /health and /metrics: refreshed in the background, so scrapes never touch the database
+cache_stats_snapshot = {'total_entries': 0, 'total_hits': 0, 'used_entries': 0}
+
+async def refresh_cache_stats():
+    while True:
+        cache_stats_snapshot.update(await db.get_cache_stats())
+        await asyncio.sleep(CACHE_STATS_REFRESH_INTERVAL)
 
-@flask_app.route('/health', methods=['GET'])
+# Quart (ASGI) App for Health Checks & Webhook - runs on the same event loop as PTB
+web_app = Quart(__name__)
+
+def make_webhook(app: Application):
+    """Webhook view bound to one PTB application; registered in main() once the app is built."""
+    bot = app.bot
+    enqueue = app.update_queue.put_nowait
+
+    async def webhook():
+        try:
+            payload = orjson.loads(await request.get_data(cache=False, as_text=False))
+            # Never wait here: acknowledge at once and let PTB process in the background
+            enqueue(Update.de_json(payload, bot))
+            return "OK", 200
+        except asyncio.QueueFull:
+            # Backpressure: Telegram redelivers the update later
+            logger.warning("⚠️ Update queue full, asking Telegram to retry")
+            return "Busy", 503
+        except Exception as e:
+            # Malformed payloads are answered with 200 so Telegram doesn't retry them
+            logger.debug("Webhook Error: %s", e)
+            return "OK", 200
+
+    return webhook
+
+JSON_HEADERS = {'Content-Type': 'application/json'}
+
+@web_app.route('/health', methods=['GET'])
 async def health_check():
     try:
         queue_stats = translation_queue.get_stats()
-        cache_stats = await db.get_cache_stats()
-        
-        uptime = datetime.now() - startup_time
-        uptime_str = str(uptime).split('.')[0]
+        cache_stats = cache_stats_snapshot
         
         is_healthy = (
             queue_stats['is_running'] and 
-            db._connection is not None
+            db.is_connected
         )
         
         status = {
             "status": "healthy" if is_healthy else "degraded",
-            "timestamp": datetime.now().isoformat(),
-            "uptime": uptime_str,
+            "timestamp": iso_timestamp(),
+            "uptime": format_uptime(uptime_seconds()),
             "services": {
-                "database": "connected" if db._connection else "disconnected",
+                "database": "connected" if db.is_connected else "disconnected",
                 "queue_worker": "running" if queue_stats['is_running'] else "stopped",
-                "bot": "active" if ptb_app.running else "inactive"
+                "bot": "active" if web_app.config['PTB_APP'].running else "inactive"
             },
             "metrics": {
                 "queue_size": queue_stats['in_queue'],
@@ -86,205 +137,335 @@ async def health_check():
                 "cache_hits": cache_stats['total_hits']
             }
         }
-        return status, 200
+        return orjson.dumps(status), 200, JSON_HEADERS
     except Exception as e:
         logger.error(f"Health check error: {e}")
         return {"status": "error", "message": str(e)}, 500
 
-@flask_app.route('/status', methods=['GET'])
-def status_page():
+@web_app.route('/status', methods=['GET'])
+async def status_page():
     try:
-        queue_stats = translation_queue.get_stats()
-        
-        # We need an async wrapper to get cache stats if we are inside sync flask route?
-        # But we are running with uvicorn/asgi, so async def works.
-        # However, calling await inside sync flask route is tricky unless using quart or async route
-        # Flask 2.0+ supports async.
         return "Status Page Placeholder - Use /health for JSON", 200
     except Exception as e:
         return str(e), 500
 
-@flask_app.route('/metrics', methods=['GET'])
-async def prometheus_metrics():
-    try:
-        queue_stats = translation_queue.get_stats()
-        cache_stats = await db.get_cache_stats()
-        
-        uptime = datetime.now() - startup_time
-        uptime_seconds = uptime.total_seconds()
-        
-        metrics = f"""# HELP darja_bot_uptime_seconds Bot uptime in seconds
+# Prometheus exposition text: HELP/TYPE lines and the config-derived gauges are rendered once at import
+METRICS_TEMPLATE = """# HELP darja_bot_uptime_seconds Bot uptime in seconds
 # TYPE darja_bot_uptime_seconds gauge
-darja_bot_uptime_seconds {uptime_seconds}
+darja_bot_uptime_seconds {uptime}
 
 # HELP darja_bot_queue_size Current queue size
 # TYPE darja_bot_queue_size gauge
-darja_bot_queue_size {queue_stats['in_queue']}
+darja_bot_queue_size {in_queue}
 
 # HELP darja_bot_queue_processed_total Total processed translations
 # TYPE darja_bot_queue_processed_total counter
-darja_bot_queue_processed_total {queue_stats['processed']}
+darja_bot_queue_processed_total {processed}
 
 # HELP darja_bot_queue_failed_total Total failed translations
 # TYPE darja_bot_queue_failed_total counter
-darja_bot_queue_failed_total {queue_stats['failed']}
+darja_bot_queue_failed_total {failed}
 
 # HELP darja_bot_cache_entries_total Total cache entries
 # TYPE darja_bot_cache_entries_total gauge
-darja_bot_cache_entries_total {cache_stats['total_entries']}
+darja_bot_cache_entries_total {total_entries}
 
 # HELP darja_bot_cache_hits_total Total cache hits
 # TYPE darja_bot_cache_hits_total counter
-darja_bot_cache_hits_total {cache_stats['total_hits']}
+darja_bot_cache_hits_total {total_hits}
+
+# HELP darja_bot_cache_hit_ratio Share of cache table lookups answered from the table since startup
+# TYPE darja_bot_cache_hit_ratio gauge
+darja_bot_cache_hit_ratio {hit_ratio}
+
+# HELP darja_bot_cache_admission_rejects_total Translations kept out of the cache table by the admission filter
+# TYPE darja_bot_cache_admission_rejects_total counter
+darja_bot_cache_admission_rejects_total {admission_rejects}
 
 # HELP darja_bot_gemini_keys Number of configured Gemini API keys
 # TYPE darja_bot_gemini_keys gauge
-darja_bot_gemini_keys {len(GEMINI_API_KEYS)}
+darja_bot_gemini_keys %d
 
 # HELP darja_bot_groq_active Groq API status (1=active, 0=inactive)
 # TYPE darja_bot_groq_active gauge
-darja_bot_groq_active {1 if GROQ_API_KEY else 0}
+darja_bot_groq_active %d
 
 # HELP darja_bot_service_up Service health status (1=up, 0=down)
 # TYPE darja_bot_service_up gauge
-darja_bot_service_up {1 if queue_stats['is_running'] else 0}
-"""
-        return metrics, 200, {'Content-Type': 'text/plain'}
+darja_bot_service_up {service_up}
+""" % (len(GEMINI_API_KEYS), 1 if GROQ_API_KEY else 0)
+METRICS_HEADERS = {'Content-Type': 'text/plain; version=0.0.4'}
+
+@web_app.route('/metrics', methods=['GET'])
+async def prometheus_metrics():
+    try:
+        queue_stats = translation_queue.get_stats()
+        cache_stats = cache_stats_snapshot
+        
+        metrics = METRICS_TEMPLATE.format(
+            uptime=uptime_seconds(),
+            in_queue=queue_stats['in_queue'],
+            processed=queue_stats['processed'],
+            failed=queue_stats['failed'],
+            total_entries=cache_stats['total_entries'],
+            total_hits=cache_stats['total_hits'],
+            hit_ratio=db.cache_lookup_hits / db.cache_lookups if db.cache_lookups else 0,
+            admission_rejects=db.cache_admission_rejects,
+            service_up=1 if queue_stats['is_running'] else 0
+        )
+        return metrics, 200, METRICS_HEADERS
     except Exception as e:
         logger.error(f"Metrics error: {e}")
         return f"# Error\n{e}", 500
 
+BOT_COMMANDS = (
+    BotCommand("start", "Restart the bot"),
+    BotCommand("help", "How to use & list commands"),
+    BotCommand("subscription", "View your subscription status"),
+    BotCommand("packages", "View upgrade packages"),
+    BotCommand("dialect", "Change region/dialect"),
+    BotCommand("history", "Show recent translations"),
+    BotCommand("saved", "View bookmarks"),
+    BotCommand("save", "Bookmark a translation (reply to it)"),
+    BotCommand("stats", "View cache statistics (admin)"),
+    BotCommand("queue", "View queue status (admin)"),
+    BotCommand("dictionary", "View offline dictionary words"),
+)
+
+# Fingerprint of the command menu; Telegram is only called when it differs from the last one set
+BOT_COMMANDS_HASH = hashlib.blake2b(
+    repr([(c.command, c.description) for c in BOT_COMMANDS]).encode(), digest_size=8
+).hexdigest()
+
 async def setup_commands(app):
-    commands = [
-        BotCommand("start", "Restart the bot"),
-        BotCommand("help", "How to use & list commands"),
-        BotCommand("subscription", "View your subscription status"),
-        BotCommand("packages", "View upgrade packages"),
-        BotCommand("dialect", "Change region/dialect"),
-        BotCommand("history", "Show recent translations"),
-        BotCommand("saved", "View bookmarks"),
-        BotCommand("save", "Bookmark a translation (reply to it)"),
-        BotCommand("stats", "View cache statistics (admin)"),
-        BotCommand("queue", "View queue status (admin)"),
-        BotCommand("dictionary", "View offline dictionary words")
-    ]
-    await app.bot.set_my_commands(commands)
-
-# Global PTB App placeholder
-ptb_app = None
+    meta_key = f"commands_hash:{app.bot.id}"
+    if await db.get_meta(meta_key) == BOT_COMMANDS_HASH:
+        return
+    await app.bot.set_my_commands(BOT_COMMANDS)
+    await db.set_meta(meta_key, BOT_COMMANDS_HASH)
 
-def main():
-    global ptb_app
+class DatabasePersistence(BasePersistence):
+    """PTB user_data kept in the bot's database (user_state table), so it survives redeploys.
     
-    # Initialize PTB Application
-    ptb_app = Application.builder().token(TELEGRAM_TOKEN).connection_pool_size(20).build()
+    The container filesystem is discarded on every Koyeb restart, so a local pickle file would not.
+    Only user_data is stored; rows are written when a user's pickled data actually changes.
+    """
+    
+    def __init__(self):
+        super().__init__(store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False))
+        self._stored = {}  # user_id -> pickled data last written
+    
+    async def get_user_data(self):
+        self._stored = await db.get_user_states()
+        return {user_id: pickle.loads(data) for user_id, data in self._stored.items()}
+    
+    async def update_user_data(self, user_id, data):
+        if not data:
+            await self.drop_user_data(user_id)
+            return
+        pickled = pickle.dumps(data)
+        if self._stored.get(user_id) != pickled:
+            await db.set_user_state(user_id, pickled)
+            self._stored[user_id] = pickled
+    
+    async def drop_user_data(self, user_id):
+        if self._stored.pop(user_id, None) is not None:
+            await db.delete_user_state(user_id)
+    
+    async def refresh_user_data(self, user_id, user_data):
+        pass
+    
+    # Chat data, bot data, callback data and conversations are not persisted
+    async def get_chat_data(self):
+        return {}
+    
+    async def get_bot_data(self):
+        return {}
+    
+    async def get_callback_data(self):
+        return None
+    
+    async def get_conversations(self, name):
+        return {}
+    
+    async def update_conversation(self, name, key, new_state):
+        pass
     
-    # Register Handlers
-    ptb_app.add_handler(CommandHandler("start", start))
-    ptb_app.add_handler(CommandHandler("help", help_command))
-    ptb_app.add_handler(CommandHandler("history", history_command))
-    ptb_app.add_handler(CommandHandler("save", save_command))
-    ptb_app.add_handler(CommandHandler("saved", saved_command))
-    ptb_app.add_handler(CommandHandler("dictionary", dictionary_command))
-    ptb_app.add_handler(CommandHandler("dialect", set_dialect))
+    async def update_chat_data(self, chat_id, data):
+        pass
     
-    ptb_app.add_handler(CommandHandler("stats", stats_command))
-    ptb_app.add_handler(CommandHandler("queue", queue_command))
+    async def update_bot_data(self, data):
+        pass
     
-    # Combined media handler (Voice/Audio/Video/Photo) is registered below
+    async def update_callback_data(self, data):
+        pass
     
-    ptb_app.add_handler(CommandHandler("packages", packages_command))
-    ptb_app.add_handler(CommandHandler("subscription", subscription_command))
+    async def drop_chat_data(self, chat_id):
+        pass
     
-    ptb_app.add_handler(CommandHandler("grant", grant_command))
-    ptb_app.add_handler(CommandHandler("revoke", revoke_command))
-    ptb_app.add_handler(CommandHandler("whitelist", whitelist_command))
-    ptb_app.add_handler(CommandHandler("review", review_command))
-    ptb_app.add_handler(CommandHandler("cancel", cancel_feedback))
-    ptb_app.add_handler(CommandHandler("broadcast", broadcast_command))
+    async def refresh_chat_data(self, chat_id, chat_data):
+        pass
     
-    ptb_app.add_handler(CallbackQueryHandler(dialect_callback, pattern="^dial_"))
-    ptb_app.add_handler(CallbackQueryHandler(save_callback, pattern="^save_fav$"))
-    ptb_app.add_handler(CallbackQueryHandler(report_callback, pattern="^report_issue$"))
-    ptb_app.add_handler(CallbackQueryHandler(upgrade_callback, pattern="^upgrade_"))
-    ptb_app.add_handler(CallbackQueryHandler(review_callback, pattern="^rev_"))
+    async def refresh_bot_data(self, bot_data):
+        pass
     
-    ptb_app.add_handler(InlineQueryHandler(handle_inline_query))
+    async def flush(self):
+        pass  # every update is already committed
+
+def build_application() -> Application:
+    """Build the PTB application with persistence and all handlers registered."""
+    # Persist per-user conversation state (e.g. pending feedback) across restarts, in the
+    # database itself. Dialect, history and favorites already live there.
+    persistence = DatabasePersistence()
     
-    ptb_app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+    # Initialize PTB Application
+    app = (
+        Application.builder()
+        .token(TELEGRAM_TOKEN)
+        .http_version("2")
+        .connection_pool_size(256)
+        .pool_timeout(30)
+        .update_queue(asyncio.Queue(maxsize=UPDATE_QUEUE_SIZE))
+        .concurrent_updates(MAX_CONCURRENT_UPDATES)
+        .persistence(persistence)
+        .build()
+    )
     
-    # Handle Photo/Audio/Voice
-    ptb_app.add_handler(MessageHandler(filters.PHOTO | filters.VOICE | filters.AUDIO | filters.VIDEO_NOTE, handle_voice))
+    # Register Handlers (one batch; callback patterns are precompiled in handlers.py)
+    app.add_handlers([
+        CommandHandler("start", start),
+        CommandHandler("help", help_command),
+        CommandHandler("history", history_command),
+        CommandHandler("save", save_command),
+        CommandHandler("saved", saved_command),
+        CommandHandler("dictionary", dictionary_command),
+        CommandHandler("dialect", set_dialect),
+        
+        CommandHandler("stats", stats_command),
+        CommandHandler("queue", queue_command),
+        
+        CommandHandler("packages", packages_command),
+        CommandHandler("subscription", subscription_command),
+        
+        CommandHandler("grant", grant_command),
+        CommandHandler("revoke", revoke_command),
+        CommandHandler("whitelist", whitelist_command),
+        CommandHandler("review", review_command),
+        CommandHandler("cancel", cancel_feedback),
+        CommandHandler("broadcast", broadcast_command),
+        
+        CallbackQueryHandler(dialect_callback, pattern=DIALECT_CALLBACK_RE),
+        CallbackQueryHandler(save_callback, pattern=SAVE_CALLBACK_RE),
+        CallbackQueryHandler(report_callback, pattern=REPORT_CALLBACK_RE),
+        CallbackQueryHandler(upgrade_callback, pattern=UPGRADE_CALLBACK_RE),
+        CallbackQueryHandler(review_callback, pattern=REVIEW_CALLBACK_RE),
+        CallbackQueryHandler(history_page_callback, pattern=HISTORY_PAGE_CALLBACK_RE),
+        CallbackQueryHandler(saved_page_callback, pattern=SAVED_PAGE_CALLBACK_RE),
+        
+        InlineQueryHandler(handle_inline_query),
+        
+        MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message),
+        
+        # Handle Photo/Audio/Voice
+        MessageHandler(filters.PHOTO | filters.VOICE | filters.AUDIO | filters.VIDEO_NOTE, handle_voice),
+    ])
     
-    # Setup ASGI for Uvicorn
-    asgi_app = WsgiToAsgi(flask_app)
+    return app
+
+def main():
+    ptb_app = build_application()
+    web_app.config['PTB_APP'] = ptb_app
+    web_app.add_url_rule('/webhook', 'webhook', make_webhook(ptb_app), methods=['POST'])
     
     async def run_webhook_server():
+        # Single worker on purpose: the PTB application and translation queue live in
+        # this process. "auto" picks httptools when uvicorn[standard] is installed.
         config = uvicorn.Config(
-            app=asgi_app,
+            app=web_app,
             host="0.0.0.0",
             port=PORT,
-            log_level="info"
+            log_level="info",
+            log_config=None,  # propagate to the root queue handler instead of uvicorn's own stream handlers
+            http="auto",
+            access_log=False
         )
         server = uvicorn.Server(config)
         await server.serve()
     
     async def run():
+        # SIGINT/SIGTERM end the run through the normal cleanup path. While uvicorn is serving it
+        # takes the signal itself, shuts down gracefully, then re-raises it to these handlers.
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop_event.set)
+            except NotImplementedError:
+                pass  # Windows: Ctrl+C still raises KeyboardInterrupt
+        
         # Connect Database
         await db.connect()
         logger.info(f"💾 Database connected: {DATABASE_PATH}")
+        stats_task = asyncio.create_task(refresh_cache_stats())
         
         # Start Queue
         await translation_queue.start_worker(ptb_app)
         
         try:
-            await ptb_app.initialize()
-            await ptb_app.start()
-            await setup_commands(ptb_app)
-            
-            if BASE_URL:
-                # Webhook Mode
-                webhook_url = f"{BASE_URL}/webhook"
-                await ptb_app.bot.set_webhook(url=webhook_url)
-                logger.info(f"🚀 Webhook mode: {webhook_url}")
-                
-                # Run web server (blocking)
-                await run_webhook_server()
-            else:
-                # Polling Mode
-                logger.info("🔄 Polling mode (local testing)")
-                await ptb_app.updater.start_polling(drop_pending_updates=True)
-                
-                # Run web server in background
-                web_task = asyncio.create_task(run_webhook_server())
-                
+            # One PTB lifetime for the whole process: initialize() on enter, shutdown() on exit
+            async with ptb_app:
+                await ptb_app.start()
                 try:
-                    while True:
-                        await asyncio.sleep(1)
-                except asyncio.CancelledError:
-                    pass
+                    await setup_commands(ptb_app)
+                    
+                    if BASE_URL:
+                        # Webhook Mode
+                        webhook_url = f"{BASE_URL}/webhook"
+                        await ptb_app.bot.set_webhook(url=webhook_url)
+                        logger.info(f"🚀 Webhook mode: {webhook_url}")
+                        
+                        # Run web server (blocking)
+                        await run_webhook_server()
+                    else:
+                        # Polling Mode
+                        logger.info("🔄 Polling mode (local testing)")
+                        await ptb_app.updater.start_polling(drop_pending_updates=True)
+                        
+                        # Web server alongside polling; a crash in it propagates, a signal stops both
+                        async with asyncio.TaskGroup() as tg:
+                            web_task = tg.create_task(run_webhook_server())
+                            await stop_event.wait()
+                            web_task.cancel()
                 finally:
-                    web_task.cancel()
-                    try:
-                        await web_task
-                    except asyncio.CancelledError:
-                        pass
-            
-            await ptb_app.stop()
-            await ptb_app.shutdown()
+                    # Always stop cleanly so persistence is flushed and the HTTP pool released
+                    if ptb_app.updater and ptb_app.updater.running:
+                        await ptb_app.updater.stop()
+                    await ptb_app.stop()
             
         finally:
+            stats_task.cancel()
             await translation_queue.stop_worker()
+            await close_api_clients()
             await db.close()
             logger.info("👋 Shutdown complete")
 
+    # libuv-based loop: cheaper socket, subprocess (ffmpeg) and timer handling for every await.
+    # Passed as the loop factory rather than installed as a global policy (deprecated by uvloop).
+    loop_factory = None
+    if uvloop is not None:
+        loop_factory = uvloop.new_event_loop
+        logger.info("⚡ Using uvloop event loop")
+    
     try:
-        asyncio.run(run())
+        asyncio.run(run(), loop_factory=loop_factory)
     except KeyboardInterrupt:
         logger.info("👋 Bot stopped by user")
     except Exception as e:
         logger.error(f"❌ Fatal error: {e}")
         raise
+    finally:
+        # Flush queued log records before the process exits
+        log_listener.stop()
 
 if __name__ == '__main__':
     main()
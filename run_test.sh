@@ -57,7 +57,7 @@ echo "   Metrics: http://localhost:$PORT/metrics"
 echo ""
 
 # Run the bot with error handling
-python app.py 2>&1 | while IFS= read -r line; do
+python main.py 2>&1 | while IFS= read -r line; do
     echo "$line"
     
     # Check for common errors
@@ -1,28 +1,39 @@
+import io
 import re
+import bisect
 import os
 import logging
 import asyncio
-import tempfile
+import time
+import threading
+import hashlib
+from types import MappingProxyType
 import edge_tts
-from datetime import datetime
+import httpx
+from cachetools import TTLCache
+from collections import OrderedDict
+from functools import lru_cache
+from itertools import accumulate, count
 from google import genai
+from google.genai import types
 from groq import AsyncGroq
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, InputFile
 from telegram.ext import Application
 
-from config import GEMINI_API_KEYS, GROQ_API_KEY, DEFAULT_MODEL, GROQ_MODEL, TTS_VOICES
+from config import GEMINI_API_KEYS, GROQ_API_KEY, DEFAULT_MODEL, GROQ_MODEL, GEMINI_HEDGE_DELAY, GEMINI_MEDIA_HEDGE_DELAY, GEMINI_ATTEMPT_TIMEOUT, PROVIDER_CONCURRENCY, TTS_VOICES, TTS_CACHE_DIR, TTS_CACHE_MAX_FILES, TRANSLATION_QUEUE_SHARDS, TRANSLATION_QUEUE_MAX_SIZE, TRANSLATION_BATCH_SIZE, TRANSLATION_STALENESS_BUDGET
 from database import db
-from utils import split_message
+from utils import iter_split_message, normalize_text
 
 logger = logging.getLogger(__name__)
 
 # ===== Dialect Configuration =====
-DIALECT_PROMPTS = {
+# Read-only views: these tables are shared by every request and must never change at runtime
+DIALECT_PROMPTS = MappingProxyType({
     'standard': 'Algerian Arabic (Darja)',
     'algiers': 'Algerian Arabic (Darja) from Algiers region',
     'oran': 'Algerian Arabic (Darja) from Oran region',
     'constantine': 'Algerian Arabic (Darja) from Constantine region'
-}
+})
 
 # ===== Local Dictionary =====
 LOCAL_DICTIONARY = {
@@ -237,6 +248,26 @@ LOCAL_DICTIONARY = {
         'note': 'Derived from Arabic "wa-la-shay"'
     }
 }
+LOCAL_DICTIONARY = MappingProxyType({word: MappingProxyType(entry) for word, entry in LOCAL_DICTIONARY.items()})
+
+# Partial-match indexes, built once: one regex alternation finds any key inside the text in a single
+# C-level pass (longest key first), and one joined string finds the text inside any key
+DICTIONARY_KEY_RE = re.compile("|".join(map(re.escape, sorted(LOCAL_DICTIONARY, key=len, reverse=True))))
+DICTIONARY_KEYS_BLOB = "\n".join(LOCAL_DICTIONARY)
+DICTIONARY_KEYS = tuple(LOCAL_DICTIONARY)
+DICTIONARY_KEY_OFFSETS = tuple(accumulate((len(key) + 1 for key in DICTIONARY_KEYS), initial=0))
+DICTIONARY_KEY_INDEX = MappingProxyType({key: i for i, key in enumerate(DICTIONARY_KEYS)})
+DICTIONARY_ENTRY_TEMPLATE = (
+    "🇩🇿 **Darja:** {darja}\n"
+    "🗣️ **Pronunciation:** {pronunciation}\n"
+    "🇫🇷 **French:** {french}\n"
+    "🇬🇧 **English:** {english}\n"
+    "💡 **Note:** {note}\n\n"
+    "⚠️ *Using offline dictionary (API unavailable)*"
+)
+# Entry lines pre-rendered per key, so a fallback answer is one concatenation
+DICTIONARY_RENDERED = tuple(map(DICTIONARY_ENTRY_TEMPLATE.format_map, LOCAL_DICTIONARY.values()))
+DICTIONARY_WORD_LIST = "📚 *Available in offline dictionary:*\n\n" + "\n".join(f"• {w}" for w in sorted(LOCAL_DICTIONARY))
 
 class DictionaryFallback:
     """Local dictionary fallback when APIs fail."""
@@ -247,51 +278,199 @@ class DictionaryFallback:
         return text.lower().strip().rstrip('?').rstrip('!').rstrip('.')
     
     @staticmethod
-    def find_match(text: str) -> dict:
-        """Find best match in local dictionary."""
+    def find_match_index(text: str) -> int:
+        """Find best match in local dictionary; its index in DICTIONARY_KEYS, or -1."""
         normalized = DictionaryFallback.normalize(text)
         
         # Direct match
-        if normalized in LOCAL_DICTIONARY:
-            return LOCAL_DICTIONARY[normalized]
+        index = DICTIONARY_KEY_INDEX.get(normalized)
+        if index is not None:
+            return index
         
-        # Partial match - check if any key is contained in text
-        for key, value in LOCAL_DICTIONARY.items():
-            if key in normalized or normalized in key:
-                return value
+        # Partial match - a key contained in the text
+        match = DICTIONARY_KEY_RE.search(normalized)
+        if match:
+            return DICTIONARY_KEY_INDEX[match.group()]
         
-        return None
+        # ... or the text contained in a key
+        if normalized and "\n" not in normalized:
+            pos = DICTIONARY_KEYS_BLOB.find(normalized)
+            if pos >= 0:
+                return bisect.bisect_right(DICTIONARY_KEY_OFFSETS, pos) - 1
+        
+        return -1
+    
+    @staticmethod
+    def find_match(text: str) -> dict:
+        """Find best match in local dictionary."""
+        index = DictionaryFallback.find_match_index(text)
+        return LOCAL_DICTIONARY[DICTIONARY_KEYS[index]] if index >= 0 else None
     
     @staticmethod
     def format_translation(text: str, match: dict) -> str:
         """Format dictionary result like API response."""
-        return (
-            f"🔤 **Original:** {text}\n"
-            f"🇩🇿 **Darja:** {match['darja']}\n"
-            f"🗣️ **Pronunciation:** {match['pronunciation']}\n"
-            f"🇫🇷 **French:** {match['french']}\n"
-            f"🇬🇧 **English:** {match['english']}\n"
-            f"💡 **Note:** {match['note']}\n\n"
-            f"⚠️ *Using offline dictionary (API unavailable)*"
-        )
+        return f"🔤 **Original:** {text}\n" + DICTIONARY_ENTRY_TEMPLATE.format_map(match)
+    
+    @staticmethod
+    def format_translation_by_index(text: str, index: int) -> str:
+        """format_translation for a find_match_index result."""
+        return f"🔤 **Original:** {text}\n" + DICTIONARY_RENDERED[index]
     
     @staticmethod
     def get_all_words() -> str:
         """Get list of all available dictionary words."""
-        words = sorted(LOCAL_DICTIONARY.keys())
-        return "📚 *Available in offline dictionary:*\n\n" + "\n".join([f"• {w}" for w in words])
+        return DICTIONARY_WORD_LIST
 
 dictionary_fallback = DictionaryFallback()
 
-def get_system_prompt(dialect='standard', context_history=None):
-    dialect_desc = DIALECT_PROMPTS.get(dialect, DIALECT_PROMPTS['standard'])
-    prompt = f"You are an expert translator for {dialect_desc}.\n"
+# Save and Report buttons attached to every translation result
+RESULT_KEYBOARD = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("⭐ Save", callback_data='save_fav'),
+        InlineKeyboardButton("👎 Report/Correct", callback_data='report_issue')
+    ]
+])
+
+# ===== API Clients =====
+# HTTP/2 keep-alive pool for Gemini: one TLS handshake per key, multiplexed streams after that
+GEMINI_HTTP_OPTIONS = types.HttpOptions(
+    async_client_args={
+        'http2': True,
+        'limits': httpx.Limits(max_connections=200, max_keepalive_connections=200, keepalive_expiry=120),
+    }
+)
+
+@lru_cache(maxsize=None)
+def get_gemini_client(api_key: str) -> genai.Client:
+    """Return the shared Gemini client for an API key (built once, reused across requests)."""
+    return genai.Client(api_key=api_key, http_options=GEMINI_HTTP_OPTIONS)
+
+@lru_cache(maxsize=1)
+def get_groq_client() -> AsyncGroq:
+    """Return the shared Groq client (one connection pool for the process)."""
+    return AsyncGroq(api_key=GROQ_API_KEY)
+
+async def close_api_clients():
+    """Close the pooled Gemini and Groq HTTP connections on shutdown."""
+    for key in GEMINI_API_KEYS:
+        client = get_gemini_client(key)
+        aclose = getattr(client.aio, 'aclose', None)
+        if aclose:
+            try:
+                await aclose()
+            except Exception as e:
+                logger.debug("Gemini client close failed: %s", e)
+    get_gemini_client.cache_clear()
+    
+    if get_groq_client.cache_info().currsize:
+        try:
+            await get_groq_client().close()
+        except Exception as e:
+            logger.debug("Groq client close failed: %s", e)
+        get_groq_client.cache_clear()
+
+# ===== Gemini Key Health =====
+# Per-key failure tracking: throttled or failing keys are skipped until their cooldown expires
+KEY_STATE = [{'fails': 0, 'cooldown_until': 0.0} for _ in GEMINI_API_KEYS]
+RATE_LIMIT_COOLDOWN = 60
+
+def get_available_keys():
+    """Return (index, key) pairs for keys not in cooldown, fewest recent failures first."""
+    now = time.time()
+    candidates = [i for i, state in enumerate(KEY_STATE) if state['cooldown_until'] < now]
+    candidates.sort(key=lambda i: KEY_STATE[i]['fails'])
+    return [(i, GEMINI_API_KEYS[i]) for i in candidates]
+
+def mark_key_failure(index: int, error: Exception):
+    """Put a key into cooldown: exponential backoff, or a full minute when rate-limited (429)."""
+    code = getattr(error, 'code', None)
+    if code == 404:
+        return  # Model not found: a model problem, the key itself is fine for the next fallback model
+    state = KEY_STATE[index]
+    if code == 429:
+        backoff = RATE_LIMIT_COOLDOWN
+    else:
+        backoff = min(RATE_LIMIT_COOLDOWN, 2 ** state['fails'])
+    state['cooldown_until'] = time.time() + backoff
+    state['fails'] += 1
+    logger.warning("🔑 Gemini key %s cooling down for %ss (%s consecutive failures)", index, backoff, state['fails'])
+
+def mark_key_success(index: int):
+    """Reset a key's failure count after a successful call."""
+    state = KEY_STATE[index]
+    state['fails'] = 0
+    state['cooldown_until'] = 0.0
+
+async def run_hedged(call, label: str, hedge_delay: float = GEMINI_HEDGE_DELAY):
+    """Run `call(client)` on the healthiest key, racing the next key if the first is slow.
+    
+    A failed call fails over to the next available key immediately; a call still
+    running after `hedge_delay` gets a hedge on the next key and the first
+    response wins. The whole race is bounded by GEMINI_ATTEMPT_TIMEOUT.
+    Raises the last error if every key fails.
+    """
+    keys = iter(get_available_keys())
+    pending = {}
+    last_error = None
+    
+    def launch() -> bool:
+        i, key = next(keys, (None, None))
+        if key is None:
+            return False
+        pending[asyncio.create_task(call(get_gemini_client(key)))] = i
+        return True
+    
+    if not launch():
+        raise RuntimeError("No Gemini API key available (none configured or all cooling down)")
+    
+    try:
+        async with asyncio.timeout(GEMINI_ATTEMPT_TIMEOUT):
+            while pending:
+                done, _ = await asyncio.wait(pending, timeout=hedge_delay, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    if launch():
+                        logger.info("⏱️ Gemini %s slow, hedging on another key", label)
+                    continue
+                
+                for task in done:
+                    i = pending.pop(task)
+                    try:
+                        response = task.result()
+                    except Exception as e:
+                        last_error = e
+                        logger.warning("Gemini error with %s, key %s: %s", label, i, e)
+                        mark_key_failure(i, e)
+                        continue
+                    mark_key_success(i)
+                    return response
+                
+                if not pending:
+                    launch()
+    finally:
+        for task in pending:
+            task.cancel()
     
-    if context_history:
-        history_list = [h['text'] for h in list(context_history)]
-        prompt += f"Recent context for reference: {history_list}\n"
+    raise last_error
+
+async def generate_hedged(model_ver: str, contents, config=None):
+    """Hedged generate_content for text requests."""
+    return await run_hedged(
+        lambda client: client.aio.models.generate_content(model=model_ver, contents=contents, config=config),
+        model_ver
+    )
 
-    prompt += """
+async def generate_from_upload(client, model_ver: str, prompt: str, upload, upload_config: dict):
+    """Upload a file with this key's client, generate from it, then delete it (uploads are per key)."""
+    sample_file = await client.aio.files.upload(file=upload, config=upload_config)
+    try:
+        return await client.aio.models.generate_content(model=model_ver, contents=[prompt, sample_file])
+    finally:
+        try:
+            await client.aio.files.delete(name=sample_file.name)
+        except Exception:
+            pass
+
+SYSTEM_PROMPT_RULES = """
 STRICT RULES:
 1. IF INPUT IS ARABIC SCRIPT -> PROVIDE FRENCH AND ENGLISH.
 2. IF INPUT IS LATIN SCRIPT -> PROVIDE DARJA (ARABIC SCRIPT) AND FRENCH AND ENGLISH.
@@ -303,101 +482,263 @@ REQUIRED OUTPUT FORMAT:
 🇬🇧 **English:** [translation]
 💡 **Note:** [Short cultural note]
 """
-    return prompt
+
+@lru_cache(maxsize=256)
+def _prompt_cached(dialect: str, history_key: tuple) -> str:
+    """Build the system prompt once per (dialect, recent history) combination."""
+    dialect_desc = DIALECT_PROMPTS.get(dialect, DIALECT_PROMPTS['standard'])
+    head = f"You are an expert translator for {dialect_desc}.\n"
+    
+    if history_key:
+        head += f"Recent context for reference: {list(history_key)}\n"
+    
+    return head + SYSTEM_PROMPT_RULES
+
+def get_system_prompt(dialect='standard', context_history=None):
+    history_key = tuple(text for text, _ in context_history) if context_history else ()
+    return _prompt_cached(dialect, history_key)
+
+@lru_cache(maxsize=256)
+def _config_cached(dialect: str, history_key: tuple) -> types.GenerateContentConfig:
+    """Validated Gemini request config, shared by every call with the same prompt."""
+    return types.GenerateContentConfig(system_instruction=_prompt_cached(dialect, history_key))
+
+def get_generation_config(dialect='standard', context_history=None):
+    history_key = tuple(text for text, _ in context_history) if context_history else ()
+    return _config_cached(dialect, history_key)
+
+@lru_cache(maxsize=16)
+def get_image_prompt(dialect: str) -> str:
+    dialect_desc = DIALECT_PROMPTS.get(dialect, DIALECT_PROMPTS['standard'])
+    return f"""
+                Analyze this image. 
+                1. If it contains text, translate it to {dialect_desc}.
+                2. If it's a scene without text, describe it briefly in {dialect_desc}.
+                
+                Provide output in this format:
+                🔤 **Detected:** [Original Text or Scene Description]
+                🇩🇿 **Darja:** [Arabic Script]
+                🗣️ **Pronunciation:** [Latin Script]
+                🇫🇷 **French:** [Translation]
+                🇬🇧 **English:** [Translation]
+                """
+
+@lru_cache(maxsize=16)
+def get_voice_prompt(dialect: str) -> str:
+    return get_system_prompt(dialect) + "\nThis is a voice message. Please transcribe the audio accurately, then provide the full translation."
+
+# ===== In-Memory Translation Cache =====
+# Hot front for the DB cache table, keyed like it: (normalized text, dialect).
+# Only context-free translations are stored, since context changes the output.
+TRANSLATION_CACHE = TTLCache(maxsize=10_000, ttl=3600)
+
+# ===== Spacing-Variant Translation Cache =====
+# Catches retyped variants that differ only in case and whitespace ("Salam  wach rak",
+# "salam wach rak") and so miss the exact caches. Punctuation, signs and symbols stay in the
+# key: "-5" and "5", or "C++" and "C", are different texts with different translations.
+VARIANT_CACHE_CAPACITY = 4096
+VARIANT_CACHE_MAX_LEN = 300  # long texts are rarely retyped; not worth keeping
+
+@lru_cache(maxsize=1024)
+def variant_key(text: str):
+    """Casefolded text with whitespace runs collapsed, or None when it is empty or too long to bother."""
+    key = ' '.join(text.casefold().split())
+    if not key or len(key) > VARIANT_CACHE_MAX_LEN:
+        return None
+    return key
+
+class VariantCache:
+    """LRU of translations keyed by (dialect, variant_key of the text)."""
+    
+    def __init__(self, capacity: int = VARIANT_CACHE_CAPACITY):
+        self.capacity = capacity
+        self.entries = OrderedDict()  # (dialect, variant key) -> translation
+    
+    def get(self, dialect: str, text: str):
+        key = variant_key(text)
+        if key is None:
+            return None
+        key = (dialect, key)
+        translation = self.entries.get(key)
+        if translation is not None:
+            self.entries.move_to_end(key)
+        return translation
+    
+    def put(self, dialect: str, text: str, translation: str):
+        key = variant_key(text)
+        if key is None:
+            return
+        key = (dialect, key)
+        self.entries[key] = translation
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+variant_cache = VariantCache()
 
 # ===== Core Logic =====
-async def translate_text(text: str, user_id: int):
+async def _no_lookup():
+    return None
+
+async def _get_verified(text: str, dialect: str):
+    try:
+        return await db.get_verified_translation(text, dialect)
+    except Exception as e:
+        logger.error("Error checking verified translations: %s", e)
+        return None  # Continue to API fallback
+
+async def translate_text(text: str, user_id: int, on_progress=None):
     user = await db.get_user(user_id)
-    history = await db.get_history(user_id) if user['context_mode'] else None
     dialect = user['dialect']
+    norm_text = normalize_text(text)
+    cache_key = (norm_text, dialect)
+    
+    # The in-memory caches cost nothing to probe; if they miss and context is off, the DB cache
+    # is certain to be consulted, so its lookup runs alongside the verified and history lookups
+    cached = TRANSLATION_CACHE.get(cache_key)
+    variant = variant_cache.get(dialect, text) if cached is None else None
+    prefetch_cache = cached is None and not variant and not user['context_mode']
+    verified, history, db_cached = await asyncio.gather(
+        _get_verified(text, dialect),
+        db.get_history(user_id) if user['context_mode'] else _no_lookup(),
+        db.get_cached_translation(norm_text, dialect) if prefetch_cache else _no_lookup()
+    )
     
     # 0. Check Verified Translations first (Highest Priority)
-    try:
-        verified = await db.get_verified_translation(text, dialect)
-        if verified:
-            logger.info(f"Verified translation hit for: {text[:50]}...")
-            await db.add_history(user_id, text)
-            return f"✅ *Verified Translation*\n\n{verified}"
-    except Exception as e:
-        logger.error(f"Error checking verified translations: {e}")
-        # Continue to API fallback
+    if verified:
+        logger.info("Verified translation hit for: %s...", text[:50])
+        await db.add_history(user_id, text)
+        return f"✅ *Verified Translation*\n\n{verified}"
     
     # Check cache first (only for dialect-specific translations without context)
-    if not user['context_mode'] or not history:
-        cached = await db.get_cached_translation(text, dialect)
+    use_cache = not user['context_mode'] or not history
+    if use_cache:
+        if cached is None:
+            if variant:
+                logger.info("Spacing-variant cache hit for: %.50s...", text)
+                await db.add_history(user_id, text)
+                return f"⚡ *Cached*\n\n{variant}"
+            if not prefetch_cache:
+                # Context mode with an empty history: only now is the cache known to apply
+                db_cached = await db.get_cached_translation(norm_text, dialect)
+            cached = db_cached
+            if cached:
+                TRANSLATION_CACHE[cache_key] = cached
+                variant_cache.put(dialect, text, cached)
         if cached:
-            logger.info(f"Cache hit for: {text[:50]}...")
+            logger.info("Cache hit for: %s...", text[:50])
             await db.add_history(user_id, text)
             return f"⚡ *Cached*\n\n{cached}"
     
+    if not use_cache:
+        translation, translated = await translate_upstream(text, dialect, history, on_progress=on_progress)
+    else:
+        # Identical context-free requests share one upstream call instead of each paying for it
+        task = INFLIGHT_TRANSLATIONS.get(cache_key)
+        if task is None:
+            task = asyncio.create_task(translate_upstream(text, dialect, None, cache_key, on_progress))
+            INFLIGHT_TRANSLATIONS[cache_key] = task
+            task.add_done_callback(lambda _: INFLIGHT_TRANSLATIONS.pop(cache_key, None))
+        else:
+            logger.info("Joining in-flight translation for: %.50s...", text)
+        # Shielded so one cancelled caller doesn't cancel the answer for the others
+        translation, translated = await asyncio.shield(task)
+    
+    if translated:
+        await db.add_history(user_id, text)
+    return translation
+
+# ===== Upstream Translation =====
+# (normalized text, dialect) -> task currently translating it
+INFLIGHT_TRANSLATIONS = {}
+PROVIDER_SLOTS = asyncio.Semaphore(PROVIDER_CONCURRENCY)
+# Minimum seconds between partial-result callbacks while Groq streams (Telegram throttles edits)
+STREAM_PROGRESS_INTERVAL = 0.8
+
+async def translate_upstream(text: str, dialect: str, history, cache_key=None, on_progress=None):
+    """Translate through Gemini, then Groq, then the offline dictionary.
+    
+    Returns (translation, translated); translated is False when every source failed.
+    A cache_key stores successful API answers in the caches. on_progress, if given,
+    is awaited with the partial text while a streamed answer is still arriving.
+    """
+    async with PROVIDER_SLOTS:
+        return await _translate_upstream(text, dialect, history, cache_key, on_progress)
+
+async def _cache_upstream(text: str, cache_key, translation: str):
+    TRANSLATION_CACHE[cache_key] = translation
+    variant_cache.put(cache_key[1], text, translation)
+    await db.cache_translation(*cache_key, translation)
+    logger.info("Cached translation for: %s...", text[:50])
+
+async def _translate_upstream(text: str, dialect: str, history, cache_key, on_progress):
     version_fallback = [DEFAULT_MODEL, "gemini-2.0-flash-lite-preview-02-05", "gemini-1.5-flash"]
     
     api_error = None
+    # Built once; every model and key below reuses the same config
+    config = get_generation_config(dialect, history)
     
-    # 1. Try Gemini first
+    # 1. Try Gemini first (hedged across keys)
     for model_ver in version_fallback:
-        for i, key in enumerate(GEMINI_API_KEYS):
-            try:
-                client = genai.Client(api_key=key)
-                response = client.models.generate_content(
-                    model=model_ver,
-                    contents=text,
-                    config={
-                        'system_instruction': get_system_prompt(dialect, history)
-                    }
-                )
-                
-                if response.text:
-                    translation = response.text
-                    await db.add_history(user_id, text)
-                    
-                    # Cache the translation (only if no context was used)
-                    if not user['context_mode'] or not history:
-                        await db.cache_translation(text, dialect, translation)
-                        logger.info(f"Cached translation for: {text[:50]}...")
-                    
-                    return translation
-                api_error = "Safety filter blocked response"
-            except Exception as e:
-                api_error = str(e)
-                logger.warning(f"Gemini error with {model_ver}, key {i}: {e}")
-                continue
+        try:
+            response = await generate_hedged(model_ver, text, config=config)
+        except Exception as e:
+            api_error = str(e)
+            continue
+        
+        if response.text:
+            translation = response.text
+            
+            # Cache the translation (only if no context was used)
+            if cache_key:
+                await _cache_upstream(text, cache_key, translation)
+            
+            return translation, True
+        api_error = "Safety filter blocked response"
     
     # 2. Try Groq as fallback if Gemini fails
     if GROQ_API_KEY:
         try:
             logger.info("Attempting Groq fallback...")
-            client = AsyncGroq(api_key=GROQ_API_KEY)
+            client = get_groq_client()
             
-            response = await client.chat.completions.create(
+            stream = await client.chat.completions.create(
                 model=GROQ_MODEL,
                 messages=[
-                    {"role": "system", "content": get_system_prompt(dialect, history)},
+                    {"role": "system", "content": config.system_instruction},
                     {"role": "user", "content": text}
-                ]
+                ],
+                stream=True
             )
             
-            if response.choices:
-                translation = response.choices[0].message.content
-                await db.add_history(user_id, text)
+            parts = []
+            last_progress = time.monotonic()
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                    if on_progress and time.monotonic() - last_progress > STREAM_PROGRESS_INTERVAL:
+                        await on_progress("".join(parts))
+                        last_progress = time.monotonic()
+            
+            if parts:
+                translation = "".join(parts)
                 
                 # Cache the translation
-                if not user['context_mode'] or not history:
-                    await db.cache_translation(text, dialect, translation)
+                if cache_key:
+                    await _cache_upstream(text, cache_key, translation)
                 
-                return translation
+                return translation, True
         except Exception as e:
             api_error = f"Groq error: {str(e)}"
             logger.error(api_error)
 
     # All APIs failed - try local dictionary fallback
-    logger.error(f"All API attempts failed. Last error: {api_error}")
-    logger.info(f"Attempting dictionary fallback for: {text[:50]}...")
+    logger.error("All API attempts failed. Last error: %s", api_error)
+    logger.info("Attempting dictionary fallback for: %.50s...", text)
     
-    match = dictionary_fallback.find_match(text)
-    if match:
-        await db.add_history(user_id, text)
-        return dictionary_fallback.format_translation(text, match)
+    match = dictionary_fallback.find_match_index(text)
+    if match >= 0:
+        return dictionary_fallback.format_translation_by_index(text, match), True
     
     # No dictionary match found
     return (
@@ -405,7 +746,7 @@ async def translate_text(text: str, user_id: int):
         "The AI translation service is currently unavailable.\n"
         "Please try again in a few minutes.\n\n"
         f"Error: `{api_error}`"
-    )
+    ), False
 
 async def translate_image(file_path: str, user_id: int):
     """Analyze and translate text from an image file using Gemini."""
@@ -418,53 +759,34 @@ async def translate_image(file_path: str, user_id: int):
     
     api_error = None
     
+    prompt = get_image_prompt(dialect)
+    upload_config = {'display_name': "Image Translation"}
+    
     for model_ver in version_fallback:
-        for i, key in enumerate(GEMINI_API_KEYS):
-            if not key: continue
-            try:
-                client = genai.Client(api_key=key)
-                
-                # Upload the image file
-                sample_file = client.files.upload(file=file_path, config={'display_name': "Image Translation"})
-                
-                # Create vision prompt
-                dialect_desc = DIALECT_PROMPTS.get(dialect, DIALECT_PROMPTS['standard'])
-                prompt = f"""
-                Analyze this image. 
-                1. If it contains text, translate it to {dialect_desc}.
-                2. If it's a scene without text, describe it briefly in {dialect_desc}.
-                
-                Provide output in this format:
-                🔤 **Detected:** [Original Text or Scene Description]
-                🇩🇿 **Darja:** [Arabic Script]
-                🗣️ **Pronunciation:** [Latin Script]
-                🇫🇷 **French:** [Translation]
-                🇬🇧 **English:** [Translation]
-                """
-                
-                response = client.models.generate_content(
-                    model=model_ver,
-                    contents=[prompt, sample_file]
-                )
-                
-                # Cleanup file
-                try:
-                    client.files.delete(name=sample_file.name)
-                except:
-                    pass
-                
-                if response and response.text:
-                    return response.text.strip()
-                    
-            except Exception as e:
-                logger.error(f"Image Gemini Error (Key {i}): {e}")
-                api_error = str(e)
-                continue
+        try:
+            response = await run_hedged(
+                lambda client: generate_from_upload(client, model_ver, prompt, file_path, upload_config),
+                model_ver, hedge_delay=GEMINI_MEDIA_HEDGE_DELAY
+            )
+        except Exception as e:
+            logger.error("Image Gemini Error (%s): %s", model_ver, e)
+            api_error = str(e)
+            continue
+        
+        if response and response.text:
+            return response.text.strip()
 
     return f"❌ Image Translation Failed\n\nError: `{api_error}`"
 
-async def translate_voice(file_path: str, user_id: int):
-    """Transcribe and translate audio file using Gemini with Groq Whisper fallback."""
+# Filename Whisper sees for in-memory audio (it infers the format from the extension)
+AUDIO_FILENAMES = {'audio/ogg': 'voice.ogg', 'audio/wav': 'voice.wav', 'audio/mpeg': 'voice.mp3'}
+
+async def translate_voice(audio, user_id: int, mime_type: str = None):
+    """Transcribe and translate audio using Gemini with Groq Whisper fallback.
+    
+    `audio` is a file path or the encoded audio bytes (bytes need `mime_type`).
+    """
+    in_memory = isinstance(audio, (bytes, bytearray))
     user = await db.get_user(user_id)
     dialect = user['dialect']
     
@@ -472,52 +794,48 @@ async def translate_voice(file_path: str, user_id: int):
     
     api_error = None
     # 1. Try Gemini first (Best for Darja because of multimodal support)
+    prompt = get_voice_prompt(dialect)
+    upload_config = {'display_name': "Voice Message"}
+    if mime_type:
+        upload_config['mime_type'] = mime_type
+    
     for model_ver in version_fallback:
-        for i, key in enumerate(GEMINI_API_KEYS):
-            if not key: continue
-            try:
-                client = genai.Client(api_key=key)
-                
-                # FIXED: path -> file
-                sample_file = client.files.upload(file=file_path, config={'display_name': "Voice Message"})
-                
-                prompt = get_system_prompt(dialect)
-                prompt += "\nThis is a voice message. Please transcribe the audio accurately, then provide the full translation."
-                
-                response = client.models.generate_content(
-                    model=model_ver,
-                    contents=[prompt, sample_file]
-                )
-                
-                try:
-                    client.files.delete(name=sample_file.name)
-                except:
-                    pass
-                
-                if response and response.text:
-                    return response.text.strip()
-                    
-            except Exception as e:
-                logger.error(f"Voice Gemini Error (Key {i}): {e}")
-                api_error = str(e)
-                continue
+        try:
+            # Each attempt gets its own stream: a hedge may upload on another key concurrently
+            response = await run_hedged(
+                lambda client: generate_from_upload(
+                    client, model_ver, prompt, io.BytesIO(audio) if in_memory else audio, upload_config
+                ),
+                model_ver, hedge_delay=GEMINI_MEDIA_HEDGE_DELAY
+            )
+        except Exception as e:
+            logger.error("Voice Gemini Error (%s): %s", model_ver, e)
+            api_error = str(e)
+            continue
+        
+        if response and response.text:
+            return response.text.strip()
 
     # 2. Try Groq Whisper Fallback
     if GROQ_API_KEY:
         try:
             logger.info("Attempting Groq Whisper fallback...")
-            client = AsyncGroq(api_key=GROQ_API_KEY)
+            client = get_groq_client()
             
-            # Groq Whisper requires the file to be opened in binary mode
-            with open(file_path, "rb") as audio_file:
-                transcription = await client.audio.transcriptions.create(
-                    file=(os.path.basename(file_path), audio_file.read()),
-                    model="whisper-large-v3",
-                    response_format="text"
-                )
+            if in_memory:
+                audio_name, audio_bytes = AUDIO_FILENAMES.get(mime_type, 'voice.ogg'), bytes(audio)
+            else:
+                # Groq Whisper requires the file to be opened in binary mode
+                with open(audio, "rb") as audio_file:
+                    audio_name, audio_bytes = os.path.basename(audio), audio_file.read()
+            transcription = await client.audio.transcriptions.create(
+                file=(audio_name, audio_bytes),
+                model="whisper-large-v3",
+                response_format="text"
+            )
             
             if transcription.text:
-                logger.info(f"Whisper transcription success: {transcription.text[:50]}...")
+                logger.info("Whisper transcription success: %.50s...", transcription.text)
                 # Now translate the transcribed text using Groq
                 return await translate_text(transcription.text, user_id)
         except Exception as e:
@@ -526,167 +844,306 @@ async def translate_voice(file_path: str, user_id: int):
 
     return f"❌ Voice Translation Failed\n\nError: `{api_error}`"
 
-async def generate_tts_audio(text: str, dialect: str) -> str:
-    """Generate TTS audio file for the given text and dialect."""
+# ===== TTS =====
+# Precompiled once; scanned in C instead of per-character Python loops
+_DARJA_LINE_RE = re.compile(r'Darja:\s*([^\n]+)')
+_ARABIC_RE = re.compile(r'[\u0600-\u06FF]')
+_ARABIC_RUN_RE = re.compile(r'[\u0600-\u06FF][\u0600-\u06FF\s]*')
+_MARKDOWN_STRIP = str.maketrans('', '', '*_')
+
+class _VoiceTable(dict):
+    """Dialect -> TTS voice; unknown dialects get the fallback voice in the same lookup."""
+    def __missing__(self, dialect):
+        return self['fallback']
+
+TTS_VOICE_TABLE = _VoiceTable(TTS_VOICES)
+
+# Spoken text below these is mostly emoji, digits or labels: not worth a round-trip to edge-tts
+_LETTER_RE = re.compile(r'[^\W\d_]')
+_URL_RE = re.compile(r'https?://\S+')
+TTS_MIN_LETTERS = 2
+TTS_MIN_LETTER_RATIO = 0.3
+
+@lru_cache(maxsize=256)
+def speakable_text(text: str):
+    """The part of a translation result worth speaking, or None if nothing is."""
+    # Remove markdown if present
+    clean_text = text.translate(_MARKDOWN_STRIP)
+    
+    # Try to extract specifically the Darja part to improve pronunciation
+    # Look for "Darja: [Arabic text]" pattern
+    darja_match = _DARJA_LINE_RE.search(clean_text)
+    if darja_match:
+        # Found Darja section, only speak this part!
+        clean_text = darja_match.group(1).strip()
+    elif _ARABIC_RE.search(clean_text):
+        # Fallback: speak only the Arabic-script runs so the Arabic voice skips Latin text and emojis
+        clean_text = " ".join(run.strip() for run in _ARABIC_RUN_RE.findall(clean_text))
+    else:
+        # Otherwise the full text will be spoken (which might sound weird for mixed langs), minus links
+        clean_text = _URL_RE.sub('', clean_text).strip()
+    
+    letters = len(_LETTER_RE.findall(clean_text))
+    if letters < TTS_MIN_LETTERS or letters < TTS_MIN_LETTER_RATIO * len(clean_text):
+        return None
+    return clean_text
+
+# Same (voice, text) always synthesizes the same clip, so clips are stored by content hash.
+# The directory is created on the first store; eviction scans it only every TTS_CACHE_EVICT_EVERY
+# stores, so the cache may run up to that many clips over TTS_CACHE_MAX_FILES in between.
+TTS_CACHE_EVICT_EVERY = 50
+_TTS_CACHE_STORES = count(1)
+
+def tts_cache_path(voice: str, clean_text: str) -> str:
+    digest = hashlib.sha256(f"{voice}\0{clean_text}".encode()).hexdigest()
+    return os.path.join(TTS_CACHE_DIR, f"{digest}.mp3")
+
+def load_cached_tts(path: str):
     try:
-        # Determine voice - remove emojis/markdown if present
-        clean_text = text.replace('*', '').replace('_', '')
-        
-        # Try to extract specifically the Darja part to improve pronunciation
-        # Look for "Darja: [Arabic text]" pattern
-        darja_match = re.search(r'Darja:\s*([^\n]+)', clean_text)
-        if darja_match:
-            # Found Darja section, only speak this part!
-            clean_text = darja_match.group(1).strip()
-            logger.info(f"Extracted Darja for TTS: {clean_text}")
-        else:
-            # Fallback: if input is short and looks like Arabic, speak it directly
-            # Otherwise the full text will be spoken (which might sound weird for mixed langs)
-            pass
+        with open(path, 'rb') as f:
+            audio = f.read()
+    except FileNotFoundError:
+        return None
+    os.utime(path)  # mtime marks recent use for eviction (atime is often disabled)
+    return audio
+
+def store_cached_tts(path: str, audio: bytes, evict: bool = False):
+    """Write a clip atomically (blocking: run it in a thread), then evict the oldest clips if asked."""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        f = open(tmp_path, 'wb')
+    except FileNotFoundError:
+        os.makedirs(TTS_CACHE_DIR, exist_ok=True)
+        f = open(tmp_path, 'wb')
+    with f:
+        f.write(audio)
+    os.replace(tmp_path, path)
+    if evict:
+        evict_tts_cache()
+
+def evict_tts_cache():
+    """Remove the least recently used clips beyond TTS_CACHE_MAX_FILES."""
+    clips = []
+    with os.scandir(TTS_CACHE_DIR) as entries:
+        for entry in entries:
+            if entry.name.endswith('.mp3'):
+                try:
+                    clips.append((entry.stat().st_mtime, entry.path))
+                except FileNotFoundError:  # evicted by a concurrent store
+                    pass
+    excess = len(clips) - TTS_CACHE_MAX_FILES
+    if excess > 0:
+        clips.sort()
+        for _, path in clips[:excess]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+async def generate_tts_audio(text: str, dialect: str) -> bytes:
+    """Generate TTS audio (MP3 bytes) for the given text and dialect."""
+    try:
+        clean_text = speakable_text(text)
+        if not clean_text:
+            return None
+        logger.info("Text for TTS: %s", clean_text)
         
         # Select voice based on dialect
-        voice = TTS_VOICES.get(dialect, TTS_VOICES['fallback'])
+        voice = TTS_VOICE_TABLE[dialect]
         
-        # Create temp file path
-        temp_dir = tempfile.gettempdir()
-        output_path = os.path.join(temp_dir, f"tts_{datetime.now().timestamp()}.mp3")
+        cache_path = tts_cache_path(voice, clean_text)
+        audio = load_cached_tts(cache_path)
+        if audio:
+            logger.info("TTS cache hit (Voice: %s)", voice)
+            return audio
         
-        # Generate audio using edge-tts
+        # Generate audio using edge-tts, collected in memory rather than via a temp file
         communicate = edge_tts.Communicate(clean_text, voice)
-        await communicate.save(output_path)
+        audio = bytearray()
+        async for chunk in communicate.stream():
+            if chunk['type'] == 'audio':
+                audio += chunk['data']
         
-        logger.info(f"Generated TTS audio: {output_path} (Voice: {voice})")
-        return output_path
+        logger.info("Generated TTS audio: %s bytes (Voice: %s)", len(audio), voice)
+        audio = bytes(audio)
+        if audio:
+            evict = next(_TTS_CACHE_STORES) % TTS_CACHE_EVICT_EVERY == 0
+            await asyncio.to_thread(store_cached_tts, cache_path, audio, evict)
+        return audio
     except Exception as e:
-        logger.error(f"TTS Error: {e}")
+        logger.error("TTS Error: %s", e)
         return None
 
 class TranslationQueue:
-    def __init__(self):
-        self.queue = asyncio.Queue()
+    """Sharded by chat: per-chat FIFO order, different chats translated in parallel."""
+    
+    def __init__(self, shards: int = TRANSLATION_QUEUE_SHARDS, max_size: int = TRANSLATION_QUEUE_MAX_SIZE):
+        self.queues = [asyncio.Queue(maxsize=max(1, max_size // shards)) for _ in range(shards)]
         self.processing = False
-        self.worker_task = None
-        self.stats = {'processed': 0, 'failed': 0, 'in_queue': 0}
-    
-    async def add_translation(self, text: str, user_id: int, chat_id: int, message_id: int):
-        """Add translation task to queue."""
-        await self.queue.put({
-            'text': text,
-            'user_id': user_id,
-            'chat_id': chat_id,
-            'message_id': message_id,
-            'timestamp': datetime.now()
-        })
-        self.stats['in_queue'] = self.queue.qsize()
-        logger.info(f"Translation queued for user {user_id}. Queue size: {self.stats['in_queue']}")
-    
-    async def process_queue(self, ptb_app: Application):
-        """Background worker to process translation queue."""
+        self.worker_tasks = []
+        self.stats = {'processed': 0, 'failed': 0, 'in_queue': 0, 'words': 0, 'rejected': 0, 'dropped': 0}
+    
+    def _pending(self):
+        return sum(q.qsize() for q in self.queues)
+    
+    async def add_translation(self, text: str, user_id: int, chat_id: int, message_id: int, words: int = 0) -> bool:
+        """Add translation task to its chat's shard. Returns False if the shard is full."""
+        now = time.monotonic()
+        try:
+            self.queues[chat_id % len(self.queues)].put_nowait({
+                'text': text,
+                'user_id': user_id,
+                'chat_id': chat_id,
+                'message_id': message_id,
+                'words': words,
+                'queued_at': now,
+                'deadline': now + TRANSLATION_STALENESS_BUDGET
+            })
+        except asyncio.QueueFull:
+            self.stats['rejected'] += 1
+            logger.warning("Translation queue full, rejected request from user %s", user_id)
+            return False
+        self.stats['in_queue'] = self._pending()
+        logger.info("Translation queued for user %s. Queue size: %s", user_id, self.stats['in_queue'])
+        return True
+    
+    async def process_queue(self, ptb_app: Application, queue: asyncio.Queue):
+        """Background worker for one shard: translate what is waiting together, deliver in arrival order."""
         while self.processing:
             try:
-                task = await asyncio.wait_for(self.queue.get(), timeout=1.0)
-                self.stats['in_queue'] = self.queue.qsize()
-                
-                try:
-                    logger.info(f"Processing translation for user {task['user_id']}")
-                    result_text = await translate_text(task['text'], task['user_id'])
-                    await self.send_translation_result(ptb_app, task, result_text)
-                    self.stats['processed'] += 1
-                except Exception as e:
-                    logger.error(f"Queue processing error: {e}")
-                    self.stats['failed'] += 1
-                    await self.send_translation_result(
-                        ptb_app, task, "❌ Error processing your translation. Please try again."
-                    )
-                finally:
-                    self.queue.task_done()
+                task = await asyncio.wait_for(queue.get(), timeout=1.0)
             except asyncio.TimeoutError:
                 continue
+            
+            batch = [task]
+            while len(batch) < TRANSLATION_BATCH_SIZE and not queue.empty():
+                batch.append(queue.get_nowait())
+            
+            try:
+                self.stats['in_queue'] = self._pending()
+                await self.process_batch(ptb_app, batch)
             except Exception as e:
-                logger.error(f"Queue worker error: {e}")
+                logger.error("Queue worker error: %s", e)
+            finally:
+                for _ in batch:
+                    queue.task_done()
+    
+    async def process_batch(self, ptb_app: Application, batch: list):
+        """Translate a chat's waiting requests concurrently, then deliver them one by one in order."""
+        now = time.monotonic()
+        live = []
+        for task in batch:
+            if now > task['deadline']:
+                await self.drop_task(ptb_app, task)
+            else:
+                live.append(task)
+        
+        results = await asyncio.gather(*(self.translate_task(ptb_app, task) for task in live), return_exceptions=True)
+        for task, result in zip(live, results):
+            await self.deliver_task(ptb_app, task, result)
+    
+    async def translate_task(self, ptb_app: Application, task: dict) -> str:
+        logger.info("Processing translation for user %s (queued %.1fs)", task['user_id'], time.monotonic() - task['queued_at'])
+        
+        async def show_partial(partial: str):
+            # Plain text: a half-streamed answer can end mid-Markdown
+            try:
+                await ptb_app.bot.edit_message_text(
+                    chat_id=task['chat_id'], message_id=task['message_id'], text=f"{partial[:4000]} ✍️"
+                )
+            except Exception as e:
+                logger.warning("Partial result edit failed: %s", e)
+        
+        return await translate_text(task['text'], task['user_id'], on_progress=show_partial)
+    
+    async def deliver_task(self, ptb_app: Application, task: dict, result):
+        """Deliver a translate_task result, or an error notice if it raised."""
+        if isinstance(result, BaseException):
+            logger.error("Queue processing error: %s", result)
+            self.stats['failed'] += 1
+            await self.send_translation_result(
+                ptb_app, task, "❌ Error processing your translation. Please try again."
+            )
+            return
+        await self.send_translation_result(ptb_app, task, result)
+        self.stats['processed'] += 1
+        self.stats['words'] += task['words']
+    
+    async def drop_task(self, ptb_app: Application, task: dict):
+        """Skip a task that waited past its deadline; the user has likely moved on."""
+        self.stats['dropped'] += 1
+        logger.warning("Dropped stale translation for user %s", task['user_id'])
+        try:
+            await ptb_app.bot.edit_message_text(
+                chat_id=task['chat_id'],
+                message_id=task['message_id'],
+                text="⌛ The bot was too busy to translate this in time. Please send it again."
+            )
+        except Exception as e:
+            logger.error("Error notifying dropped translation: %s", e)
     
     async def send_translation_result(self, ptb_app: Application, task: dict, result_text: str):
-        """Send translation result back to the chat."""
+        """Send translation result back to the chat, followed by its audio pronunciation."""
+        # Synthesis doesn't depend on delivery, so it runs while the text goes out
+        audio_task = None
+        if not result_text.startswith("❌") and speakable_text(result_text):
+            audio_task = asyncio.create_task(self.synthesize_audio(task, result_text))
+        
         try:
-            chunks = split_message(result_text)
-            
-            # Create keyboard with Save and Report buttons
-            keyboard = [
-                [
-                    InlineKeyboardButton("⭐ Save", callback_data='save_fav'),
-                    InlineKeyboardButton("👎 Report/Correct", callback_data='report_issue')
-                ]
-            ]
-            
-            for i, chunk in enumerate(chunks):
-                try:
-                    if i == 0:
-                        await ptb_app.bot.edit_message_text(
-                            chat_id=task['chat_id'],
-                            message_id=task['message_id'],
-                            text=chunk,
-                            parse_mode='Markdown',
-                            reply_markup=InlineKeyboardMarkup(keyboard)
-                        )
-                    else:
-                        await ptb_app.bot.send_message(
-                            chat_id=task['chat_id'],
-                            text=chunk,
-                            parse_mode='Markdown',
-                            reply_markup=InlineKeyboardMarkup(keyboard)
-                        )
-                except Exception as parse_error:
-                    logger.warning(f"Markdown parsing failed: {parse_error}")
-                    if i == 0:
-                        await ptb_app.bot.edit_message_text(
-                            chat_id=task['chat_id'],
-                            message_id=task['message_id'],
-                            text=chunk,
-                            reply_markup=InlineKeyboardMarkup(keyboard)
-                        )
-                    else:
-                        await ptb_app.bot.send_message(
-                            chat_id=task['chat_id'],
-                            text=chunk,
-                            reply_markup=InlineKeyboardMarkup(keyboard)
-                        )
-            
-            # Generate and send TTS audio
-            if not result_text.startswith("❌"):
+            # Chunks stay sequential: concurrent sends could arrive out of order
+            for i, chunk in enumerate(iter_split_message(result_text)):
+                await self.send_chunk(ptb_app, task, chunk, edit=i == 0)
+        except Exception as e:
+            logger.error("Error sending translation result: %s", e)
+        
+        if audio_task:
+            audio = await audio_task
+            if audio:
                 try:
-                    user = await db.get_user(task['user_id'])
-                    dialect = user['dialect']
-                    audio_path = await generate_tts_audio(result_text, dialect)
-                    
-                    if audio_path:
-                        with open(audio_path, 'rb') as audio:
-                            await ptb_app.bot.send_voice(
-                                chat_id=task['chat_id'],
-                                voice=audio,
-                                caption="🗣️ Audio Pronunciation",
-                                reply_to_message_id=task['message_id']
-                            )
-                        os.remove(audio_path)
+                    await ptb_app.bot.send_voice(
+                        chat_id=task['chat_id'],
+                        voice=InputFile(audio, filename='voice.mp3'),
+                        caption="🗣️ Audio Pronunciation",
+                        reply_to_message_id=task['message_id']
+                    )
                 except Exception as tts_error:
-                    logger.error(f"TTS Send Error: {tts_error}")
-                    
-        except Exception as e:
-            logger.error(f"Error sending translation result: {e}")
+                    logger.error("TTS Send Error: %s", tts_error)
+    
+    async def send_chunk(self, ptb_app: Application, task: dict, chunk: str, edit: bool):
+        """Send one chunk (the first replaces the status message), retrying without Markdown."""
+        if edit:
+            send, target = ptb_app.bot.edit_message_text, {'message_id': task['message_id']}
+        else:
+            send, target = ptb_app.bot.send_message, {}
+        try:
+            await send(chat_id=task['chat_id'], text=chunk, parse_mode='Markdown', reply_markup=RESULT_KEYBOARD, **target)
+        except Exception as parse_error:
+            logger.warning("Markdown parsing failed: %s", parse_error)
+            await send(chat_id=task['chat_id'], text=chunk, reply_markup=RESULT_KEYBOARD, **target)
+    
+    async def synthesize_audio(self, task: dict, result_text: str):
+        try:
+            user = await db.get_user(task['user_id'])
+            return await generate_tts_audio(result_text, user['dialect'])
+        except Exception as tts_error:
+            logger.error("TTS Send Error: %s", tts_error)
+            return None
     
     async def start_worker(self, ptb_app: Application):
         if not self.processing:
             self.processing = True
-            self.worker_task = asyncio.create_task(self.process_queue(ptb_app))
-            logger.info("Translation queue worker started")
+            self.worker_tasks = [asyncio.create_task(self.process_queue(ptb_app, q)) for q in self.queues]
+            logger.info("Translation queue started with %s workers", len(self.worker_tasks))
     
     async def stop_worker(self):
         self.processing = False
-        if self.worker_task:
-            await self.worker_task
-            logger.info("Translation queue worker stopped")
+        if self.worker_tasks:
+            await asyncio.gather(*self.worker_tasks)
+            self.worker_tasks = []
+            logger.info("Translation queue workers stopped")
     
     def get_stats(self):
-        return self.stats
+        return {**self.stats, 'in_queue': self._pending(), 'is_running': self.processing}
 
 # Global Queue instance
 translation_queue = TranslationQueue()
@@ -60,25 +60,31 @@ async def setup():
                 "ON CONFLICT (user_id) DO UPDATE SET username = EXCLUDED.username, can_grant_access = 1",
                 (user_id, username)
             )
+            # subscription_id is the only key, so guard re-runs against a second Unlimited row
             await conn.execute(
                 "INSERT INTO user_subscriptions (user_id, package_id, is_active, end_date) "
-                "VALUES (%s, 4, 1, CURRENT_TIMESTAMP + INTERVAL '100 years') "
-                "ON CONFLICT DO NOTHING",
-                (user_id,)
+                "SELECT %s, 4, 1, CURRENT_TIMESTAMP + INTERVAL '100 years' "
+                "WHERE NOT EXISTS (SELECT 1 FROM user_subscriptions WHERE user_id = %s AND package_id = 4 AND is_active = 1)",
+                (user_id, user_id)
             )
             # psycopg 3 connection commits automatically on __aexit__ if no error
     else:
         # aiosqlite.connect() returns a connection object that is an async context manager
         # Do NOT await it before using it in 'async with'
         async with aiosqlite.connect(DB_PATH) as conn:
+            # One write transaction (one journal flush); a running bot never sees half the setup
+            await conn.execute("BEGIN IMMEDIATE")
+            await conn.execute("INSERT OR IGNORE INTO users (user_id) VALUES (?)", (user_id,))
             await conn.execute(
                 "INSERT OR REPLACE INTO admin_users (user_id, username, can_grant_access) VALUES (?, ?, 1)",
                 (user_id, username)
             )
+            # subscription_id is the only key, so INSERT OR REPLACE added a new row on every run
             await conn.execute(
-                "INSERT OR REPLACE INTO user_subscriptions (user_id, package_id, is_active, end_date) "
-                "VALUES (?, 4, 1, datetime('now', '+100 years'))",
-                (user_id,)
+                "INSERT INTO user_subscriptions (user_id, package_id, is_active, end_date) "
+                "SELECT ?, 4, 1, datetime('now', '+100 years') "
+                "WHERE NOT EXISTS (SELECT 1 FROM user_subscriptions WHERE user_id = ? AND package_id = 4 AND is_active = 1)",
+                (user_id, user_id)
             )
             await conn.commit()
     
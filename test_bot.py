@@ -3,11 +3,25 @@
 
 import os
 import sys
+from importlib.util import find_spec
 from dotenv import load_dotenv
 
 # Load test environment
 load_dotenv('.env.test')
 
+# (module, pip package) for every third-party runtime dependency
+REQUIRED_MODULES = [
+    ("quart", "quart"),
+    ("telegram", "python-telegram-bot"),
+    ("google.genai", "google-genai"),
+    ("groq", "groq"),
+    ("aiosqlite", "aiosqlite"),
+    ("psycopg", "psycopg"),
+    ("edge_tts", "edge-tts"),
+    ("cachetools", "cachetools"),
+    ("orjson", "orjson"),
+]
+
 def test_setup():
     """Test basic setup."""
     print("🧪 Testing Darja Bot Setup\n")
@@ -40,70 +54,17 @@ def test_setup():
     if not api_key and not grok_key:
         print("❌ No AI API keys configured! Dictionary fallback only.")
     
-    # Test imports
+    # Test imports (find_spec locates each package without running its import-time setup)
     print("\n📦 Testing imports...")
-    try:
-        import flask
-        print("  ✅ Flask")
-    except ImportError as e:
-        print(f"  ❌ Flask: {e}")
-        return False
-    
-    try:
-        import telegram
-        print("  ✅ python-telegram-bot")
-    except ImportError as e:
-        print(f"  ❌ python-telegram-bot: {e}")
-        return False
-    
-    try:
-        import google.generativeai
-        print("  ✅ google-generativeai")
-    except ImportError as e:
-        print(f"  ❌ google-generativeai: {e}")
-        return False
-    
-    try:
-        import aiosqlite
-        print("  ✅ aiosqlite")
-    except ImportError as e:
-        print(f"  ❌ aiosqlite: {e}")
-        return False
-    
-    try:
-        import groq
-        print("  ✅ groq")
-    except ImportError as e:
-        print(f"  ❌ groq: {e}")
-        return False
-
-    
-    try:
-        import telegram
-        print("  ✅ python-telegram-bot")
-    except ImportError as e:
-        print(f"  ❌ python-telegram-bot: {e}")
-        return False
-    
-    try:
-        import google.generativeai
-        print("  ✅ google-generativeai")
-    except ImportError as e:
-        print(f"  ❌ google-generativeai: {e}")
-        return False
-    
-    try:
-        import aiosqlite
-        print("  ✅ aiosqlite")
-    except ImportError as e:
-        print(f"  ❌ aiosqlite: {e}")
-        return False
-    
-    try:
-        import openai
-        print("  ✅ openai (Grok)")
-    except ImportError as e:
-        print(f"  ❌ openai: {e}")
+    missing = False
+    for module, label in REQUIRED_MODULES:
+        try:
+            found = find_spec(module) is not None
+        except ModuleNotFoundError:  # parent package of a dotted name is missing
+            found = False
+        print(f"  {'✅' if found else '❌'} {label}")
+        missing = missing or not found
+    if missing:
         return False
     
     print("\n✨ Setup looks good!")
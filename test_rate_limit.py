@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""Rate limit regression tests (run with: python -m unittest test_rate_limit)."""
+
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', 'test')
+os.environ.setdefault('GROQ_API_KEY', 'test')
+os.environ['DATABASE_URL'] = ''
+os.environ.pop('REDIS_URL', None)
+
+import database
+import handlers
+
+WINDOW = 3600
+# 45 minutes into an hourly bucket
+NOW = 1_000 * WINDOW + 2700
+
+class FreeTierDenialTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = database.Database(db_path=os.path.join(self.tmp.name, 'test.db'), db_url='')
+        await self.db.connect()
+        await self.db.get_user(1)
+        self.clock = mock.patch.object(database.time, 'time', return_value=NOW)
+        self.clock.start()
+
+    async def asyncTearDown(self):
+        self.clock.stop()
+        await self.db.close()
+        self.tmp.cleanup()
+
+    async def send(self, text='salam'):
+        message = SimpleNamespace(text=text, reply_text=mock.AsyncMock())
+        update = SimpleNamespace(message=message, effective_user=SimpleNamespace(id=1))
+        with mock.patch.object(handlers, 'db', self.db):
+            await handlers.handle_message(update, SimpleNamespace(user_data={}))
+        return message.reply_text.await_args.args[0]
+
+    async def test_denied_retries_keep_the_same_reset(self):
+        for _ in range(14):
+            allowed, _, last_reset = await self.db.check_rate_limit(1, 14, 60)
+            self.assertTrue(allowed)
+        # 14 stored, none in the previous bucket: one more fits 15 min (rollover) + 1/14 of the next hour
+        self.assertEqual(last_reset, 20)
+        for _ in range(3):
+            self.assertEqual(await self.db.check_rate_limit(1, 14, 60), (False, 0, 20))
+        cursor = await self.db.execute('SELECT cur_count FROM rate_limits WHERE user_id = 1')
+        self.assertEqual((await cursor.fetchone())[0], 14)
+
+    async def test_denial_message(self):
+        for _ in range(14):
+            await self.db.check_rate_limit(1, 14, 60)
+        for _ in range(2):
+            self.assertEqual(
+                await self.send(),
+                "⏱️ *Rate Limit Reached!*\n\n"
+                "You've used all 14 translations in your free tier.\n\n"
+                "✨ *Upgrade to continue translating:*\n"
+                "• Basic: 50 translations/hour\n"
+                "• Pro: 200 translations/hour\n"
+                "• Unlimited: No limits!\n\n"
+                "Or wait 20 minute(s) for your limit to reset."
+            )
+
+if __name__ == '__main__':
+    unittest.main()
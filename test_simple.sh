@@ -25,7 +25,7 @@ echo "(Press Ctrl+C to stop)"
 echo ""
 
 # Run bot with timeout for quick test
-timeout 30 python app.py 2>&1 | tee bot_test.log &
+timeout 30 python main.py 2>&1 | tee bot_test.log &
 PID=$!
 
 sleep 5
@@ -1,9 +1,36 @@
+import re
+
+# One pass over a message: Arabic-script words in group 1, words in any other script in group 2
+WORD_RE = re.compile(r'([\u0600-\u06FF]+)|([^\W\d_\u0600-\u06FF]+)')
+
+def iter_split_message(text, limit=4000):
+    """Yields chunks that fit Telegram's 4096 character limit, one slice at a time."""
+    for i in range(0, len(text), limit):
+        yield text[i:i + limit]
+
 def split_message(text, limit=4000):
     """Splits text into chunks to fit Telegram's 4096 character limit."""
-    return [text[i:i + limit] for i in range(0, len(text), limit)]
+    return list(iter_split_message(text, limit))
+
+# Markdown-significant character -> its escaped form, applied in one str.translate pass
+MARKDOWN_ESCAPES = str.maketrans({'_': '\\_', '*': '\\*', '`': '\\`', '[': '\\['})
 
 def escape_markdown(text):
     """Escapes special characters for Telegram MarkdownV2."""
     # Since we use simple Markdown (parse_mode=Markdown), we only need to worry about unclosed symbols usually.
     # But strictly for MarkdownV2:
-    return text.replace('_', '\\_').replace('*', '\\*').replace('`', '\\`').replace('[', '\\[')
+    return text.translate(MARKDOWN_ESCAPES)
+
+def normalize_text(text):
+    """Canonical cache-key form of a message; computed once per message and passed down."""
+    return text.strip().casefold()
+
+def count_words(text):
+    """Return (arabic_words, other_words) from a single regex scan."""
+    arabic = other = 0
+    for m in WORD_RE.finditer(text):
+        if m.group(1):
+            arabic += 1
+        else:
+            other += 1
+    return arabic, other
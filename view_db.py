@@ -1,77 +1,144 @@
 #!/usr/bin/env python3
 """View Darja Bot SQLite Database"""
 
+import io
 import os
 import sys
+import time
+from contextlib import redirect_stdout
+from functools import lru_cache
+from itertools import groupby
+from operator import itemgetter
 from datetime import datetime
 
 # Load environment
 from dotenv import load_dotenv
 load_dotenv('.env.test') or load_dotenv('.env')
 
-import aiosqlite
-import asyncio
+import sqlite3
 
 try:
     import psycopg
-    from psycopg.rows import dict_row
 except ImportError:
     psycopg = None
 
 DATABASE_URL = os.getenv('DATABASE_URL')
 DB_PATH = os.getenv('DATABASE_PATH', 'translations.db')
 
+SQLITE_READ_PRAGMAS = """
+    PRAGMA cache_size = -20000;
+    PRAGMA temp_store = MEMORY;
+    PRAGMA mmap_size = 268435456;
+"""
+PG_SESSION_OPTIONS = "-c statement_timeout=10s -c work_mem=16MB"
+# Same setting as the bot: executions before a query becomes a server-side prepared statement
+# (off unless set, since a transaction-mode PgBouncer can't keep them). With it set, every
+# --watch refresh after the first reuses the prepared plans.
+_prepare_threshold = os.getenv("DB_PREPARE_THRESHOLD", "none")
+PG_PREPARE_THRESHOLD = int(_prepare_threshold) if _prepare_threshold.isdigit() else None
+
+@lru_cache(maxsize=64)
+def pg_placeholders(query):
+    """sqlite '?' placeholders -> psycopg '%s'; the viewer's queries are constants, so each is rewritten once."""
+    return query.replace('?', '%s')
+
 class UnifiedDB:
+    """Blocking connection to either backend: a one-shot viewer has nothing to overlap."""
     def __init__(self, db_path, db_url=None):
         self.db_path = db_path
         self.db_url = db_url
         self.conn = None
         self.is_pg = False
 
-    async def connect(self):
+    def connect(self):
         if self.db_url and psycopg:
             try:
-                self.conn = await psycopg.AsyncConnection.connect(self.db_url, autocommit=True)
+                # Session settings ride along in the startup packet: no extra round-trips
+                self.conn = psycopg.connect(
+                    self.db_url, autocommit=True, options=PG_SESSION_OPTIONS, prepare_threshold=PG_PREPARE_THRESHOLD
+                )
                 self.is_pg = True
                 return True
             except Exception as e:
                 print(f"⚠️ Failed to connect to PostgreSQL: {e}")
         
         if os.path.exists(self.db_path):
-            self.conn = await aiosqlite.connect(self.db_path)
+            self.conn = sqlite3.connect(self.db_path, timeout=5)
+            # Connection-local read tuning; journal_mode/synchronous are the bot's to set (WAL persists in the file)
+            self.conn.executescript(SQLITE_READ_PRAGMAS)
             self.is_pg = False
             return True
         return False
 
     def p(self, query):
-        if self.is_pg:
-            return query.replace('?', '%s')
-        return query
+        return pg_placeholders(query) if self.is_pg else query
 
-    async def execute(self, query, params=None):
+    def execute(self, query, params=None):
         query = self.p(query)
         if self.is_pg and self.conn:
-            cur = await self.conn.execute(query, params)
-            return cur
+            return self.conn.execute(query, params)
         elif self.conn:
-            return await self.conn.execute(query, params)
+            return self.conn.execute(query, params or ())
         raise Exception("Database not connected")
 
-    async def fetchall(self, cursor):
-        return await cursor.fetchall()
+    def fetchall(self, cursor):
+        return cursor.fetchall()
 
-    async def fetchone(self, cursor):
-        return await cursor.fetchone()
+    def fetchone(self, cursor):
+        return cursor.fetchone()
 
-    async def close(self):
+    def close(self):
         if self.conn:
-            await self.conn.close()
+            self.conn.close()
+
+# Every count the report shows, fetched in one round-trip
+COUNTS_QUERY = " UNION ALL ".join([
+    "SELECT 'users', COUNT(*) FROM users",
+    "SELECT 'history', COUNT(*) FROM history",
+    "SELECT 'favorites', COUNT(*) FROM favorites",
+    "SELECT 'cache', COUNT(*) FROM cache",
+    "SELECT 'cache_hits', COALESCE(SUM(hit_count), 0) FROM cache",
+    "SELECT 'rate_limits', COUNT(*) FROM rate_limits",
+])
+
+def stream_rows(cursor, header):
+    """Yield rows as the cursor fetches them, printing the column header before the first one."""
+    for row in cursor:
+        if header:
+            print(header)
+            print("-" * 60)
+            header = None
+        yield row
 
-async def view_database():
-    """Display all database contents."""
+def print_rows(cursor, header, row_fmt, convert=None):
+    """Stream rows through a prebuilt row_fmt (bound str.format); convert reshapes a row first."""
+    rows = stream_rows(cursor, header)
+    if convert:
+        rows = map(convert, rows)
+    sys.stdout.writelines(row_fmt(*row) for row in rows)
+
+def preview(head, truncated, width):
+    """Render a text column selected as (substr(text, 1, width), length(text) > width)."""
+    return head[:width - 3] + '...' if truncated else head
+
+def view_database(db=None):
+    """Display all database contents. An already connected db is reused and left open."""
+    # The report is rendered into memory and written once: one write instead of one per line,
+    # and --watch redraws the screen in a single step instead of line by line
+    out = io.StringIO()
+    try:
+        with redirect_stdout(out):
+            render_database(db)
+    finally:
+        sys.stdout.write(out.getvalue())
+        sys.stdout.flush()
+
+def render_database(db=None):
     
-    db = UnifiedDB(DB_PATH, DATABASE_URL)
-    if not await db.connect():
+    owns_db = db is None
+    if owns_db:
+        db = UnifiedDB(DB_PATH, DATABASE_URL)
+    if owns_db and not db.connect():
         print(f"❌ Database not found or connection failed.")
         print(f"   DATABASE_URL: {'Set' if DATABASE_URL else 'Not set'}")
         print(f"   DATABASE_PATH: {DB_PATH} ({'Exists' if os.path.exists(DB_PATH) else 'Missing'})")
@@ -85,196 +152,203 @@ async def view_database():
         print(f"🌐 Database: PostgreSQL ({display_url})")
     else:
         print(f"📁 Database: {DB_PATH} (SQLite)")
-        if os.path.exists(DB_PATH):
-            print(f"💾 Size: {os.path.getsize(DB_PATH) / 1024:.1f} KB")
+        try:
+            st = os.stat(DB_PATH)  # one syscall for both size and mtime
+        except OSError:
+            st = None
+        if st:
+            print(f"💾 Size: {st.st_size / 1024:.1f} KB")
+            print(f"🕐 Last modified: {datetime.fromtimestamp(st.st_mtime):%Y-%m-%d %H:%M:%S}")
 
     
     print()
     
     try:
+        cursor = db.execute(COUNTS_QUERY)
+        counts = dict(db.fetchall(cursor))
+        
         # 1. Users Table
         print("1️⃣  USERS TABLE")
         print("-" * 60)
-        cursor = await db.execute("SELECT COUNT(*) FROM users")
-        count = (await db.fetchone(cursor))[0]
-        print(f"Total users: {count}")
+        print(f"Total users: {counts['users']}")
         
-        cursor = await db.execute("SELECT user_id, dialect, context_mode, created_at FROM users ORDER BY created_at DESC LIMIT 10")
-        rows = await db.fetchall(cursor)
-        if rows:
-            print(f"{'User ID':<15} {'Dialect':<12} {'Context Mode':<13} {'Created At'}")
-            print("-" * 60)
-            for row in rows:
-                user_id, dialect, context_mode, created_at = row
-                print(f"{user_id:<15} {dialect:<12} {'✅ On' if context_mode else '❌ Off':<13} {created_at}")
+        # Counts come first, so an empty table skips its listing query. Listings walk an index or
+        # the primary key (ids grow in insertion order) instead of sorting; cache and rate_limits are
+        # left to sort, since indexing hit_count/cur_count would tax every bot request for this view
+        if counts['users']:
+            cursor = db.execute("SELECT user_id, dialect, context_mode, created_at FROM users ORDER BY created_at DESC LIMIT 10")
+            print_rows(
+                cursor, f"{'User ID':<15} {'Dialect':<12} {'Context Mode':<13} {'Created At'}",
+                "{:<15} {:<12} {:<13} {}\n".format,
+                lambda r: (r[0], r[1], '✅ On' if r[2] else '❌ Off', r[3])
+            )
         print()
         
         # 2. History Table
         print("2️⃣  HISTORY TABLE (Last 10 translations)")
         print("-" * 60)
-        cursor = await db.execute("SELECT COUNT(*) FROM history")
-        count = (await db.fetchone(cursor))[0]
-        print(f"Total history entries: {count}")
+        print(f"Total history entries: {counts['history']}")
         
-        cursor = await db.execute("""
-            SELECT h.id, u.user_id, h.text, h.time 
-            FROM history h 
-            JOIN users u ON h.user_id = u.user_id 
-            ORDER BY h.time DESC 
-            LIMIT 10
-        """)
-        rows = await db.fetchall(cursor)
-        if rows:
-            print(f"{'ID':<5} {'User ID':<15} {'Text':<35} {'Time'}")
-            print("-" * 60)
-            for row in rows:
-                id_, user_id, text, time = row
-                text_preview = text[:32] + '...' if len(text) > 35 else text
-                print(f"{id_:<5} {user_id:<15} {text_preview:<35} {time}")
+        if counts['history']:
+            cursor = db.execute("""
+                SELECT h.id, u.user_id, substr(h.text, 1, 35), length(h.text) > 35, h.time 
+                FROM history h 
+                JOIN users u ON h.user_id = u.user_id 
+                ORDER BY h.id DESC 
+                LIMIT 10
+            """)
+            print_rows(
+                cursor, f"{'ID':<5} {'User ID':<15} {'Text':<35} {'Time'}",
+                "{:<5} {:<15} {:<35} {}\n".format,
+                lambda r: (r[0], r[1], preview(r[2], r[3], 35), r[4])
+            )
         print()
         
         # 3. Favorites Table
         print("3️⃣  FAVORITES TABLE")
         print("-" * 60)
-        cursor = await db.execute("SELECT COUNT(*) FROM favorites")
-        count = (await db.fetchone(cursor))[0]
-        print(f"Total favorites: {count}")
+        print(f"Total favorites: {counts['favorites']}")
         
-        cursor = await db.execute("""
-            SELECT f.id, u.user_id, f.text, f.created_at 
-            FROM favorites f 
-            JOIN users u ON f.user_id = u.user_id 
-            ORDER BY f.created_at DESC 
-            LIMIT 10
-        """)
-        rows = await db.fetchall(cursor)
-        if rows:
-            print(f"{'ID':<5} {'User ID':<15} {'Text Preview':<40}")
-            print("-" * 60)
-            for row in rows:
-                id_, user_id, text, created_at = row
-                text_preview = text[:37] + '...' if len(text) > 40 else text
-                print(f"{id_:<5} {user_id:<15} {text_preview}")
+        if counts['favorites']:
+            cursor = db.execute("""
+                SELECT f.id, u.user_id, substr(f.text, 1, 40), length(f.text) > 40 
+                FROM favorites f 
+                JOIN users u ON f.user_id = u.user_id 
+                ORDER BY f.id DESC 
+                LIMIT 10
+            """)
+            print_rows(
+                cursor, f"{'ID':<5} {'User ID':<15} {'Text Preview':<40}",
+                "{:<5} {:<15} {}\n".format,
+                lambda r: (r[0], r[1], preview(r[2], r[3], 40))
+            )
         print()
         
         # 4. Cache Table
         print("4️⃣  CACHE TABLE (Translation cache)")
         print("-" * 60)
-        cursor = await db.execute("SELECT COUNT(*) FROM cache")
-        count = (await db.fetchone(cursor))[0]
-        print(f"Total cached translations: {count}")
-        
-        cursor = await db.execute("SELECT COALESCE(SUM(hit_count), 0) FROM cache")
-        total_hits = (await db.fetchone(cursor))[0]
-        print(f"Total cache hits: {total_hits}")
+        print(f"Total cached translations: {counts['cache']}")
+        print(f"Total cache hits: {counts['cache_hits']}")
         
-        cursor = await db.execute("""
-            SELECT text, dialect, hit_count, last_used 
-            FROM cache 
-            ORDER BY hit_count DESC 
-            LIMIT 10
-        """)
-        rows = await db.fetchall(cursor)
-        if rows:
-            print(f"\n{'Text':<25} {'Dialect':<12} {'Hits':<8} {'Last Used'}")
-            print("-" * 60)
-            for row in rows:
-                text, dialect, hits, last_used = row
-                text_preview = text[:22] + '...' if len(text) > 25 else text
-                print(f"{text_preview:<25} {dialect:<12} {hits:<8} {last_used}")
+        if counts['cache']:
+            cursor = db.execute("""
+                SELECT substr(text, 1, 25), length(text) > 25, dialect, hit_count, last_used 
+                FROM cache 
+                ORDER BY hit_count DESC 
+                LIMIT 10
+            """)
+            print_rows(
+                cursor, f"\n{'Text':<25} {'Dialect':<12} {'Hits':<8} {'Last Used'}",
+                "{:<25} {:<12} {:<8} {}\n".format,
+                lambda r: (preview(r[0], r[1], 25), r[2], r[3], r[4])
+            )
         print()
         
         # 5. Rate Limits Table
         print("5️⃣  RATE LIMITS TABLE")
         print("-" * 60)
-        cursor = await db.execute("SELECT COUNT(*) FROM rate_limits")
-        count = (await db.fetchone(cursor))[0]
-        print(f"Active rate limit entries: {count}")
+        print(f"Active rate limit entries: {counts['rate_limits']}")
         
-        cursor = await db.execute("""
-            SELECT user_id, request_count, window_start 
-            FROM rate_limits 
-            ORDER BY request_count DESC 
-            LIMIT 10
-        """)
-        rows = await db.fetchall(cursor)
-        if rows:
-            print(f"{'User ID':<15} {'Requests':<10} {'Window Start'}")
-            print("-" * 60)
-            for row in rows:
-                user_id, requests, window_start = row
-                print(f"{user_id:<15} {requests:<10} {window_start}")
+        if counts['rate_limits']:
+            cursor = db.execute("""
+                SELECT user_id, cur_count, prev_count, bucket 
+                FROM rate_limits 
+                ORDER BY cur_count DESC 
+                LIMIT 10
+            """)
+            print_rows(
+                cursor, f"{'User ID':<15} {'Current':<10} {'Previous':<10} {'Bucket'}",
+                "{:<15} {:<10} {:<10} {}\n".format
+            )
         print()
         
         # 6. Admin Users Table
         print("6️⃣  ADMIN USERS TABLE")
         print("-" * 60)
-        cursor = await db.execute("SELECT user_id, username, is_admin, can_grant_access FROM admin_users")
-        rows = await db.fetchall(cursor)
-        if rows:
-            print(f"{'User ID':<15} {'Username':<15} {'Admin':<7} {'Grant'}")
-            print("-" * 60)
-            for row in rows:
-                user_id, username, is_admin, can_grant = row
-                print(f"{user_id:<15} {str(username):<15} {'✅' if is_admin else '❌':<7} {'✅' if can_grant else '❌'}")
+        cursor = db.execute("SELECT user_id, username, is_admin, can_grant_access FROM admin_users")
+        print_rows(
+            cursor, f"{'User ID':<15} {'Username':<15} {'Admin':<7} {'Grant'}",
+            "{:<15} {:<15} {:<7} {}\n".format,
+            lambda r: (r[0], str(r[1]), '✅' if r[2] else '❌', '✅' if r[3] else '❌')
+        )
         print()
 
         # 7. Packages Table
         print("7️⃣  PACKAGES TABLE")
         print("-" * 60)
-        cursor = await db.execute("SELECT package_id, name, translations_limit, price_usd, duration_days FROM packages")
-        rows = await db.fetchall(cursor)
-        if rows:
-            print(f"{'ID':<4} {'Name':<12} {'Limit':<8} {'Price':<8} {'Duration'}")
-            print("-" * 60)
-            for row in rows:
-                pid, name, limit, price, duration = row
-                print(f"{pid:<4} {name:<12} {limit:<8} ${price:<7.2f} {duration} days")
+        cursor = db.execute("SELECT package_id, name, translations_limit, price_usd, duration_days FROM packages")
+        print_rows(
+            cursor, f"{'ID':<4} {'Name':<12} {'Limit':<8} {'Price':<8} {'Duration'}",
+            "{:<4} {:<12} {:<8} ${:<7.2f} {} days\n".format
+        )
         print()
 
         # 8. Subscriptions Table
         print("8️⃣  USER SUBSCRIPTIONS TABLE")
         print("-" * 60)
-        cursor = await db.execute("""
+        cursor = db.execute("""
             SELECT s.subscription_id, s.user_id, p.name, s.start_date, s.end_date, s.is_active
             FROM user_subscriptions s
             JOIN packages p ON s.package_id = p.package_id
             ORDER BY s.start_date DESC
             LIMIT 10
         """)
-        rows = await db.fetchall(cursor)
-        if rows:
-            print(f"{'ID':<4} {'User ID':<15} {'Package':<12} {'End Date':<20} {'Active'}")
-            print("-" * 60)
-            for row in rows:
-                sid, uid, pkg, start, end, active = row
-                print(f"{sid:<4} {uid:<15} {pkg:<12} {str(end):<20} {'✅' if active else '❌'}")
+        print_rows(
+            cursor, f"{'ID':<4} {'User ID':<15} {'Package':<12} {'End Date':<20} {'Active'}",
+            "{:<4} {:<15} {:<12} {:<20} {}\n".format,
+            lambda r: (r[0], r[1], r[2], str(r[4]), '✅' if r[5] else '❌')
+        )
         print()
 
         if not db.is_pg:
             # 9. Database Schema (SQLite only for simplicity)
             print("9️⃣  DATABASE SCHEMA")
             print("-" * 60)
-            cursor = await db.execute("SELECT name FROM sqlite_master WHERE type='table'")
-            tables = await db.fetchall(cursor)
+            # Every table's columns in one query (table-valued pragma) rather than a PRAGMA per table
+            cursor = db.execute("""
+                SELECT m.name, p.name
+                FROM sqlite_master m JOIN pragma_table_info(m.name) p
+                WHERE m.type = 'table'
+                ORDER BY m.rowid, p.cid
+            """)
             print("Tables:")
-            for table in tables:
-                print(f"  • {table[0]}")
+            for table, columns in groupby(cursor, key=itemgetter(0)):
+                print(f"  • {table} ({', '.join(column for _, column in columns)})")
     
     except Exception as e:
         print(f"❌ Error while reading data: {e}")
         import traceback
         traceback.print_exc()
     finally:
-        await db.close()
+        if owns_db:
+            db.close()
     
     print()
     print("=" * 60)
     print("✅ Database view complete!")
 
+def watch_database(interval):
+    """Redraw the view every interval seconds over one connection (PRAGMAs/session setup paid once)."""
+    db = UnifiedDB(DB_PATH, DATABASE_URL)
+    if not db.connect():
+        view_database()  # prints the connection diagnostics
+        return
+    try:
+        while True:
+            print("\033[2J\033[H", end="")  # clear screen
+            view_database(db)
+            print(f"🔄 Refreshing every {interval:g}s (Ctrl+C to exit)")
+            time.sleep(interval)
+    finally:
+        db.close()
+
 if __name__ == '__main__':
     try:
-        asyncio.run(view_database())
+        # Usage: view_db.py [--watch SECONDS]
+        if len(sys.argv) > 1 and sys.argv[1] == '--watch':
+            watch_database(float(sys.argv[2]) if len(sys.argv) > 2 else 5.0)
+        else:
+            view_database()
     except KeyboardInterrupt:
         print("\n\n👋 Viewer closed")
     except Exception as e: